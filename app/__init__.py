@@ -3,7 +3,9 @@ from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
 import os
 
-db = SQLAlchemy()
+from app.tenancy import TenantSession
+
+db = SQLAlchemy(session_options={'class_': TenantSession})
 
 
 def create_app():
@@ -23,12 +25,41 @@ def create_app():
     # Initialize database
     db.init_app(app)
     
+    # Serve fingerprinted static assets
+    from app import assets
+    assets.init_app(app)
+    
+    # Archival commands
+    from app import archive
+    archive.init_app(app)
+    
+    # Per-collection database routing
+    from app import tenancy
+    tenancy.init_app(app)
+    
+    # Group-commit write path for new records
+    from app import writequeue
+    writequeue.init_app(app)
+    
+    # Morph genetics trait catalog
+    from app import genetics
+    genetics.init_app(app)
+    
+    # Change log for live updates
+    from app import events
+    events.init_app(app)
+    
+    # Point-in-time snapshots
+    from app import snapshots
+    snapshots.init_app(app)
+    
     # Register blueprints
     from app.routes import main
     app.register_blueprint(main)
     
-    # Create database tables
+    # Create database tables and indexes
+    from app.models import init_schema
     with app.app_context():
-        db.create_all()
+        init_schema(db.engine)
     
     return app
@@ -0,0 +1,314 @@
+# Hot/cold archival of old records for HerpTracker
+import json
+import zlib
+from datetime import date, datetime, timedelta
+
+import click
+from flask import current_app
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+from app import db, tenancy
+from app.models import (Reptile, Feeding, Shedding, Measurement, Defecation, Breeding, Cleaning,
+                        RecordArchive)
+
+# Archivable record models keyed by table name (also the RecordArchive.record_type)
+RECORD_MODELS = {
+    'feedings': Feeding,
+    'sheddings': Shedding,
+    'measurements': Measurement,
+    'defecations': Defecation,
+    'breedings': Breeding,
+    'cleanings': Cleaning
+}
+
+EPOCH = datetime(1970, 1, 1)
+MICROSECOND = timedelta(microseconds=1)
+PAYLOAD_VERSION = 1
+
+
+# ============ Columnar Encoding ============
+
+def _delta(values):
+    return [b - a for a, b in zip([0] + values, values)]
+
+
+def _undelta(values):
+    total, out = 0, []
+    for value in values:
+        total += value
+        out.append(total)
+    return out
+
+
+def _encode_column(column, values):
+    """Encode one column's values, delta-coding integers and timestamps."""
+    if isinstance(column.type, db.DateTime):
+        values = [None if v is None else (v - EPOCH) // MICROSECOND for v in values]
+        codec = 'datetime'
+    elif isinstance(column.type, db.Date):
+        values = [None if v is None else v.toordinal() for v in values]
+        codec = 'date'
+    elif isinstance(column.type, db.Integer):
+        codec = 'int'
+    else:
+        return {'codec': 'raw', 'values': values}
+
+    if None in values:
+        return {'codec': codec, 'values': values}
+    return {'codec': codec + '-delta', 'values': _delta(values)}
+
+
+def _decode_column(encoded):
+    codec, values = encoded['codec'], encoded['values']
+    if codec.endswith('-delta'):
+        codec, values = codec[:-len('-delta')], _undelta(values)
+    if codec == 'datetime':
+        return [None if v is None else EPOCH + v * MICROSECOND for v in values]
+    if codec == 'date':
+        return [None if v is None else date.fromordinal(v) for v in values]
+    return values
+
+
+def encode_rows(model, rows):
+    """Pack row dicts into a compressed column-oriented payload."""
+    columns = {}
+    for column in model.__table__.columns:
+        columns[column.name] = _encode_column(column, [row[column.name] for row in rows])
+    document = {'version': PAYLOAD_VERSION, 'count': len(rows), 'columns': columns}
+    return zlib.compress(json.dumps(document, separators=(',', ':')).encode('utf-8'), 9)
+
+
+def decode_rows(payload):
+    """Unpack a payload produced by encode_rows() into row dicts."""
+    document = json.loads(zlib.decompress(payload).decode('utf-8'))
+    columns = {name: _decode_column(encoded) for name, encoded in document['columns'].items()}
+    return [{name: values[i] for name, values in columns.items()} for i in range(document['count'])]
+
+
+def _row(record):
+    return {c.name: getattr(record, c.name) for c in record.__table__.columns}
+
+
+def _detached(model, row):
+    """Build a read-only model instance for an archived row."""
+    record = model(**row)
+    record.archived = True
+    return record
+
+
+# ============ Archive / Un-archive ============
+
+def _pinned_ids(session, model, reptile_id):
+    """Ids of rows that must stay hot so the dashboard "days since" stats stay exact."""
+    criteria = [()]
+    if model is Cleaning:
+        criteria.append((Cleaning.cleaning_type == 'full',))
+
+    ids = set()
+    for extra in criteria:
+        latest = session.query(model).filter_by(reptile_id=reptile_id).filter(*extra) \
+            .order_by(model.recorded_at.desc()).first()
+        if latest:
+            ids.add(latest.id)
+    return ids
+
+
+def archive_records(before, record_types=None, session=None):
+    """Move records older than ``before`` into per-reptile, per-year archive blobs.
+
+    The newest record of each type per reptile is always kept hot. Returns the
+    number of archived rows per record type. Moving rows is not a user-visible
+    change, so it is kept out of the live-update change log.
+    """
+    from app import events
+
+    session = session or db.session
+    with events.suppressed(session):
+        return _archive_records(session, before, record_types)
+
+
+def _archive_records(session, before, record_types):
+    record_types = record_types or current_app.config['ARCHIVE_RECORD_TYPES']
+    counts = dict.fromkeys(record_types, 0)
+    reptile_ids = [reptile_id for (reptile_id,) in session.query(Reptile.id)]
+
+    for record_type in record_types:
+        model = RECORD_MODELS[record_type]
+        for reptile_id in reptile_ids:
+            pinned = _pinned_ids(session, model, reptile_id)
+            records = session.query(model).filter(
+                model.reptile_id == reptile_id, model.recorded_at < before, ~model.id.in_(pinned)).all()
+            if not records:
+                continue
+
+            by_year = {}
+            for record in records:
+                by_year.setdefault(record.recorded_at.year, []).append(record)
+
+            for year, group in by_year.items():
+                archive = session.query(RecordArchive).filter_by(
+                    reptile_id=reptile_id, record_type=record_type, year=year).first()
+                rows = [_row(record) for record in group]
+                if archive:
+                    rows = decode_rows(archive.payload) + rows
+                else:
+                    archive = RecordArchive(reptile_id=reptile_id, record_type=record_type, year=year)
+                    session.add(archive)
+
+                rows.sort(key=lambda row: (row['recorded_at'], row['id']))
+                archive.payload = encode_rows(model, rows)
+                archive.row_count = len(rows)
+
+                for record in group:
+                    session.delete(record)
+
+            session.commit()
+            counts[record_type] += len(records)
+
+    return counts
+
+
+def unarchive_records(reptile_id=None, record_type=None, year=None, session=None):
+    """Restore archived records into the live tables. Returns the row count."""
+    from app import events
+
+    session = session or db.session
+    with events.suppressed(session):
+        return _unarchive_records(session, reptile_id, record_type, year)
+
+
+def _unarchive_records(session, reptile_id, record_type, year):
+    query = session.query(RecordArchive)
+    if reptile_id is not None:
+        query = query.filter_by(reptile_id=reptile_id)
+    if record_type is not None:
+        query = query.filter_by(record_type=record_type)
+    if year is not None:
+        query = query.filter_by(year=year)
+
+    restored = 0
+    for archive in query.all():
+        model = RECORD_MODELS[archive.record_type]
+        rows = decode_rows(archive.payload)
+
+        # Ids can be reused by SQLite once the original rows are gone
+        taken = {record_id for (record_id,) in session.query(model.id)
+                 .filter(model.id.in_([row['id'] for row in rows]))}
+        for row in rows:
+            if row['id'] in taken:
+                row.pop('id')
+            session.add(model(**row))
+
+        restored += len(rows)
+        session.delete(archive)
+        session.commit()
+
+    return restored
+
+
+# ============ Transparent Reads ============
+
+def archived_records(reptile_id, record_type, limit=None):
+    """Archived records for a reptile as detached model instances, newest first."""
+    model = RECORD_MODELS[record_type]
+    archives = RecordArchive.query.filter_by(reptile_id=reptile_id, record_type=record_type) \
+        .order_by(RecordArchive.year.desc())
+
+    records = []
+    for archive in archives:
+        rows = sorted(decode_rows(archive.payload), key=lambda row: row['recorded_at'], reverse=True)
+        for row in rows:
+            records.append(_detached(model, row))
+            if limit is not None and len(records) >= limit:
+                return records
+    return records
+
+
+def history(reptile, record_type, limit=50):
+    """Newest ``limit`` records of a type, reading through to the archive when needed."""
+    hot = getattr(reptile, record_type).limit(limit).all()
+
+    newest_year = db.session.query(db.func.max(RecordArchive.year)) \
+        .filter_by(reptile_id=reptile.id, record_type=record_type).scalar()
+    if newest_year is None:
+        return hot
+    if len(hot) >= limit and hot[-1].recorded_at.year > newest_year:
+        return hot
+
+    merged = hot + archived_records(reptile.id, record_type, limit)
+    merged.sort(key=lambda record: record.recorded_at, reverse=True)
+    return merged[:limit]
+
+
+def iter_archived_rows(record_type, session=None):
+    """Yield every archived row of a type as a dict (used by exports)."""
+    session = session or db.session
+    for archive in session.query(RecordArchive).filter_by(record_type=record_type).yield_per(50):
+        yield from decode_rows(archive.payload)
+
+
+# ============ CLI ============
+
+def _archive_tenant(path, before, record_types):
+    engine = create_engine(f'sqlite:///{path}')
+    try:
+        with Session(engine) as session:
+            return archive_records(before, record_types, session=session)
+    finally:
+        engine.dispose()
+
+
+def _unarchive_tenant(path, reptile_id, record_type, year):
+    engine = create_engine(f'sqlite:///{path}')
+    try:
+        with Session(engine) as session:
+            return unarchive_records(reptile_id, record_type, year, session=session)
+    finally:
+        engine.dispose()
+
+
+def init_app(app):
+    """Register archival commands."""
+
+    @app.cli.command('archive-records')
+    @click.option('--days', type=int, default=None,
+                  help='Archive records older than this many days (default: ARCHIVE_AFTER_DAYS).')
+    @click.option('--tenant', default=None, help='Archive only this collection.')
+    @click.option('--all-tenants', is_flag=True, help='Also archive every collection.')
+    @click.option('--workers', type=int, default=None)
+    def archive_command(days, tenant, all_tenants, workers):
+        """Move old records into compressed archive storage."""
+        days = days if days is not None else app.config['ARCHIVE_AFTER_DAYS']
+        before = datetime.utcnow() - timedelta(days=days)
+        record_types = app.config['ARCHIVE_RECORD_TYPES']
+        tenants = tenancy.tenant_paths(app, tenant, all_tenants)
+
+        if tenant is None:
+            for record_type, count in archive_records(before, record_types).items():
+                print(f'{record_type}: {count} archived')
+        results = tenancy.fan_out(_archive_tenant, [path for _, path in tenants],
+                                  [before] * len(tenants), [record_types] * len(tenants), workers=workers)
+        for (slug, _), counts in zip(tenants, results):
+            for record_type, count in counts.items():
+                print(f'{slug}: {record_type}: {count} archived')
+
+    @app.cli.command('unarchive-records')
+    @click.option('--reptile', 'reptile_id', type=int, default=None)
+    @click.option('--type', 'record_type', type=click.Choice(sorted(RECORD_MODELS)), default=None)
+    @click.option('--year', type=int, default=None)
+    @click.option('--tenant', default=None, help='Restore only in this collection.')
+    @click.option('--all-tenants', is_flag=True, help='Also restore in every collection.')
+    @click.option('--workers', type=int, default=None)
+    def unarchive_command(reptile_id, record_type, year, tenant, all_tenants, workers):
+        """Restore archived records into the live tables."""
+        tenants = tenancy.tenant_paths(app, tenant, all_tenants)
+
+        if tenant is None:
+            restored = unarchive_records(reptile_id, record_type, year)
+            print(f'{restored} records restored')
+        count = len(tenants)
+        results = tenancy.fan_out(_unarchive_tenant, [path for _, path in tenants], [reptile_id] * count,
+                                  [record_type] * count, [year] * count, workers=workers)
+        for (slug, _), restored in zip(tenants, results):
+            print(f'{slug}: {restored} records restored')
@@ -0,0 +1,244 @@
+# Static asset pipeline for HerpTracker
+import gzip
+import hashlib
+import io
+import json
+import mimetypes
+import os
+import re
+import shutil
+
+from flask import current_app, request, send_from_directory
+from werkzeug.security import safe_join
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - brotli is optional
+    brotli = None
+
+try:
+    from PIL import Image
+except ImportError:  # pragma: no cover - Pillow is optional
+    Image = None
+
+
+DIST_DIR = 'dist'
+MANIFEST_NAME = 'manifest.json'
+
+# Source directories (relative to the static folder) that get built
+SOURCE_DIRS = ('css', 'js', 'img')
+
+# Text assets that are worth precompressing
+COMPRESSIBLE = {'.css', '.js', '.svg'}
+
+# Precompressed variants, in order of preference
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+IMAGE_EXTENSIONS = {'JPEG': '.jpg', 'PNG': '.png', 'WEBP': '.webp', 'GIF': '.gif'}
+
+
+# ============ Minifiers ============
+
+def minify_css(source):
+    """Strip comments and redundant whitespace from a stylesheet."""
+    source = re.sub(r'/\*.*?\*/', '', source, flags=re.S)
+    source = re.sub(r'\s+', ' ', source)
+    source = re.sub(r'\s*([{};,>])\s*', r'\1', source)
+    # Only the space *after* a colon is safe to drop ("a :hover" != "a:hover")
+    source = re.sub(r':\s+', ':', source)
+    return source.replace(';}', '}').strip()
+
+
+def minify_js(source):
+    """Strip comments and indentation from a script.
+
+    Conservative on purpose: string and template literals are copied verbatim
+    and newlines are kept so automatic semicolon insertion still applies.
+    Regex literals containing '//' or '/*' are not supported.
+    """
+    out = []
+    code = []
+    i, n = 0, len(source)
+
+    def flush_code():
+        text = ''.join(code)
+        text = re.sub(r'[ \t]*\n\s*', '\n', text)
+        out.append(re.sub(r'[ \t]+', ' ', text))
+        code.clear()
+
+    while i < n:
+        ch = source[i]
+        if ch in '\'"`':
+            j = i + 1
+            while j < n and source[j] != ch:
+                j += 2 if source[j] == '\\' else 1
+            flush_code()
+            out.append(source[i:j + 1])
+            i = j + 1
+        elif source.startswith('//', i):
+            end = source.find('\n', i)
+            i = n if end == -1 else end
+        elif source.startswith('/*', i):
+            end = source.find('*/', i + 2)
+            i = n if end == -1 else end + 2
+        else:
+            code.append(ch)
+            i += 1
+    flush_code()
+    return ''.join(out).strip() + '\n'
+
+
+def optimize_image(data, max_size):
+    """Downscale and re-encode an image, returning (bytes, extension).
+
+    Falls back to the original bytes when Pillow is not installed or when
+    re-encoding would not make the file smaller.
+    """
+    if Image is None:
+        return data, None
+
+    with Image.open(io.BytesIO(data)) as img:
+        fmt = img.format
+        if fmt not in IMAGE_EXTENSIONS or getattr(img, 'is_animated', False):
+            return data, None
+        img.thumbnail((max_size, max_size))
+        buffer = io.BytesIO()
+        if fmt == 'JPEG':
+            img.save(buffer, 'JPEG', quality=85, optimize=True, progressive=True)
+        else:
+            img.save(buffer, fmt, optimize=True)
+
+    optimized = buffer.getvalue()
+    if len(optimized) >= len(data):
+        return data, IMAGE_EXTENSIONS[fmt]
+    return optimized, IMAGE_EXTENSIONS[fmt]
+
+
+# ============ Build ============
+
+def _process(path, image_max_size):
+    """Return the built bytes and output extension for a source file."""
+    ext = os.path.splitext(path)[1].lower()
+    with open(path, 'rb') as f:
+        data = f.read()
+
+    if ext == '.css':
+        return minify_css(data.decode('utf-8')).encode('utf-8'), ext
+    if ext == '.js':
+        return minify_js(data.decode('utf-8')).encode('utf-8'), ext
+    if ext in {'.png', '.jpg', '.jpeg', '.gif', '.webp'}:
+        data, detected = optimize_image(data, image_max_size)
+        return data, detected or ext
+    return data, ext
+
+
+def _write(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as f:
+        f.write(data)
+
+
+def build_assets(static_folder, image_max_size=192):
+    """Build fingerprinted, minified and precompressed assets.
+
+    Output goes to ``<static_folder>/dist`` along with a manifest mapping each
+    source path (e.g. ``css/style.css``) to its hashed build path.
+    """
+    dist = os.path.join(static_folder, DIST_DIR)
+    if os.path.isdir(dist):
+        shutil.rmtree(dist)
+
+    manifest = {}
+    for source_dir in SOURCE_DIRS:
+        root = os.path.join(static_folder, source_dir)
+        for dirpath, _, filenames in os.walk(root):
+            for filename in sorted(filenames):
+                path = os.path.join(dirpath, filename)
+                source = os.path.relpath(path, static_folder).replace(os.sep, '/')
+
+                data, ext = _process(path, image_max_size)
+                digest = hashlib.sha256(data).hexdigest()[:12]
+                stem = os.path.splitext(os.path.basename(source))[0]
+                built = '/'.join(filter(None, [DIST_DIR, os.path.dirname(source), f'{stem}.{digest}{ext}']))
+
+                target = os.path.join(static_folder, *built.split('/'))
+                _write(target, data)
+                if ext in COMPRESSIBLE:
+                    _write(target + '.gz', gzip.compress(data, compresslevel=9, mtime=0))
+                    if brotli is not None:
+                        _write(target + '.br', brotli.compress(data, quality=11))
+
+                manifest[source] = built
+
+    with open(os.path.join(dist, MANIFEST_NAME), 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    return manifest
+
+
+def load_manifest(path):
+    """Load an asset manifest, returning an empty mapping if it is missing."""
+    if not os.path.isfile(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+# ============ Serving ============
+
+def rewrite_static_url(endpoint, values):
+    """Resolve ``url_for('static', filename=...)`` through the manifest."""
+    if endpoint != 'static' or 'filename' not in values:
+        return
+    manifest = current_app.extensions.get('assets', {})
+    built = manifest.get(values['filename'])
+    if built:
+        values['filename'] = built
+
+
+def serve_static(filename):
+    """Serve static files, with long-lived caching for fingerprinted assets."""
+    if not filename.startswith(DIST_DIR + '/'):
+        return current_app.send_static_file(filename)
+
+    static_folder = current_app.static_folder
+    max_age = current_app.config['ASSET_MAX_AGE']
+    mimetype = mimetypes.guess_type(filename)[0]
+
+    for encoding, suffix in ENCODINGS:
+        if not request.accept_encodings[encoding]:
+            continue
+        encoded_path = safe_join(static_folder, filename + suffix)
+        if encoded_path and os.path.isfile(encoded_path):
+            response = send_from_directory(static_folder, filename + suffix,
+                                           mimetype=mimetype, max_age=max_age)
+            response.headers['Content-Encoding'] = encoding
+            break
+    else:
+        response = send_from_directory(static_folder, filename, max_age=max_age)
+
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    response.vary.add('Accept-Encoding')
+    return response
+
+
+def init_app(app):
+    """Hook the asset manifest into URL building and static serving."""
+    app.extensions['assets'] = load_manifest(app.config['ASSET_MANIFEST'])
+    app.url_defaults(rewrite_static_url)
+    app.view_functions['static'] = serve_static
+
+    @app.cli.command('build-assets')
+    def build_assets_command():
+        """Minify, fingerprint and precompress static assets."""
+        manifest = build_assets(app.static_folder, app.config['ASSET_IMAGE_MAX_SIZE'])
+        for source, built in sorted(manifest.items()):
+            print(f'{source} -> {built}')
+
+
+if __name__ == '__main__':
+    from config import Config
+
+    static = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static')
+    for source, built in sorted(build_assets(static, Config.ASSET_IMAGE_MAX_SIZE).items()):
+        print(f'{source} -> {built}')
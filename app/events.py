@@ -0,0 +1,304 @@
+# Live updates for HerpTracker: change log + Server-Sent Events
+import itertools
+import json
+import random
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+import click
+from flask import current_app
+from sqlalchemy import create_engine, delete, event, func, select
+from sqlalchemy.orm import Session, object_session
+
+from app import db, tenancy
+from app.models import Reptile, ChangeEvent
+from app.archive import RECORD_MODELS
+
+REPTILE_FIELDS = ('id', 'name', 'species', 'mutation', 'gender', 'image_path')
+SUPPRESS_KEY = 'skip_change_log'
+RETRY_MS = 3000
+BUSY_RETRY_MS = (5000, 15000)
+PRUNE_EVERY = 500  # logged changes between retention passes
+
+# Set from CHANGE_LOG_RETENTION_SECONDS by init_app(); queued inserts log
+# changes from the writer thread, which has no app context
+retention_seconds = 3600
+_logged = itertools.count(1)
+
+
+# ============ Publishing ============
+
+def record_change(connection, action, target):
+    """Append a change to the log inside the caller's transaction."""
+    if isinstance(target, Reptile):
+        reptile_id = target.id
+        payload = {field: getattr(target, field) for field in REPTILE_FIELDS}
+    else:
+        reptile_id = target.reptile_id
+        payload = target.to_dict()
+
+    connection.execute(ChangeEvent.__table__.insert().values(
+        created_at=datetime.utcnow(),
+        action=action,
+        record_type=target.__tablename__,
+        record_id=target.id,
+        reptile_id=reptile_id,
+        payload=None if action == 'deleted' else json.dumps(payload)
+    ))
+
+    # Keep the log bounded whether or not anyone is streaming it
+    if next(_logged) % PRUNE_EVERY == 0:
+        prune_change_log(connection, retention_seconds)
+
+
+def prune_change_log(connection, retention):
+    """Delete change log entries older than ``retention`` seconds. Returns the row count."""
+    cutoff = datetime.utcnow() - timedelta(seconds=retention)
+    return connection.execute(delete(ChangeEvent).where(ChangeEvent.created_at < cutoff)).rowcount
+
+
+def prune_database(path, retention):
+    """prune_change_log() on a database file, for the tenant fan-out and the snapshot scheduler."""
+    engine = create_engine(f'sqlite:///{path}')
+    try:
+        with engine.begin() as conn:
+            return prune_change_log(conn, retention)
+    finally:
+        engine.dispose()
+
+
+def _listener(action):
+    def listener(mapper, connection, target):
+        session = object_session(target)
+        if session is not None and session.info.get(SUPPRESS_KEY):
+            return
+        record_change(connection, action, target)
+    return listener
+
+
+@contextmanager
+def suppressed(session):
+    """Don't log changes flushed through ``session``, e.g. records moved by archiving."""
+    previous = session.info.get(SUPPRESS_KEY)
+    session.info[SUPPRESS_KEY] = True
+    try:
+        yield
+    finally:
+        session.info[SUPPRESS_KEY] = previous
+
+
+LISTENERS = (
+    ('after_insert', _listener('created')),
+    ('after_update', _listener('updated')),
+    ('after_delete', _listener('deleted')),
+)
+
+
+def reptile_summary(reptile):
+    """Reptile fields plus the stats shown on cards and the profile page."""
+    summary = reptile.to_dict()
+    summary['days_since_full_clean'] = reptile.days_since_last_full_clean()
+    latest = reptile.latest_measurement()
+    summary['latest_measurement'] = latest.to_dict() if latest else None
+    return summary
+
+
+# ============ Fan-out ============
+
+class ChangeFeed:
+    """Polls one database's change log and fans new events out to subscribers.
+
+    One poller thread per process and database serves every open stream, so
+    an idle connection costs a waiting thread and no database queries. The
+    thread exits when the last subscriber leaves.
+    """
+
+    def __init__(self, engine, interval=0.5, retention=3600, backlog=500):
+        self.engine = engine
+        self.interval = interval
+        self.retention = retention
+        self._cond = threading.Condition()
+        self._events = deque(maxlen=backlog)
+        self._floor = 0  # every event with id > floor is in _events
+        self._last_id = 0
+        self._subscribers = 0
+        self._thread = None
+        self._last_prune = 0.0
+
+    def subscribe(self, last_event_id=None):
+        """Register a subscriber and return its starting cursor."""
+        with self._cond:
+            self._subscribers += 1
+            if self._thread is None:
+                with Session(self.engine) as session:
+                    self._last_id = self._floor = session.scalar(select(func.max(ChangeEvent.id))) or 0
+                self._events.clear()
+                self._thread = threading.Thread(target=self._run, name='change-feed', daemon=True)
+                self._thread.start()
+            return self._last_id if last_event_id is None else last_event_id
+
+    def unsubscribe(self):
+        with self._cond:
+            self._subscribers -= 1
+
+    def wait(self, cursor, timeout):
+        """Wait for events after ``cursor``.
+
+        Returns ``(events, cursor)``; ``events`` is None when events after the
+        cursor have already been pruned from the change log and the client
+        has to resync.
+        """
+        with self._cond:
+            if cursor >= self._floor:
+                if self._last_id <= cursor:
+                    self._cond.wait(timeout)
+                if cursor >= self._floor:
+                    events = [e for e in self._events if e['id'] > cursor]
+                    return events, (events[-1]['id'] if events else cursor)
+            floor = self._floor
+
+        # Older than the in-memory backlog, e.g. a client reconnecting to
+        # another worker: catch up from the change log itself
+        events = self._backfill(cursor, floor)
+        if events is None:
+            return None, cursor
+        return events, (events[-1]['id'] if events else floor)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                if self._subscribers <= 0:
+                    self._thread = None
+                    return
+            try:
+                events = self._poll()
+            except Exception:
+                events = []
+            if events:
+                with self._cond:
+                    for e in events:
+                        if len(self._events) == self._events.maxlen:
+                            self._floor = self._events[0]['id']
+                        self._events.append(e)
+                    self._last_id = events[-1]['id']
+                    self._cond.notify_all()
+            time.sleep(self.interval)
+
+    def _poll(self):
+        with Session(self.engine) as session:
+            events = self._read(session, self._last_id)
+
+            if time.monotonic() - self._last_prune > 60:
+                self._last_prune = time.monotonic()
+                prune_change_log(session.connection(), self.retention)
+                session.commit()
+
+        return events
+
+    def _backfill(self, cursor, floor):
+        """Events in ``(cursor, floor]`` from the change log, or None if some were pruned."""
+        with Session(self.engine) as session:
+            # Ids are never reused, so a gap after the cursor means pruned events
+            oldest = session.scalar(select(func.min(ChangeEvent.id)))
+            if oldest is None or oldest > cursor + 1:
+                return None
+            return self._read(session, cursor, floor)
+
+    @staticmethod
+    def _read(session, after, until=None):
+        query = select(ChangeEvent).where(ChangeEvent.id > after)
+        if until is not None:
+            query = query.where(ChangeEvent.id <= until)
+        rows = session.scalars(query.order_by(ChangeEvent.id).limit(500)).all()
+
+        # One summary per touched reptile, shared by every subscriber
+        summaries = {}
+        for reptile_id in {row.reptile_id for row in rows if row.reptile_id}:
+            reptile = session.get(Reptile, reptile_id)
+            summaries[reptile_id] = reptile_summary(reptile) if reptile else None
+
+        return [{
+            'id': row.id,
+            'data': json.dumps({
+                'action': row.action,
+                'record_type': row.record_type,
+                'record_id': row.record_id,
+                'reptile_id': row.reptile_id,
+                'record': json.loads(row.payload) if row.payload else None,
+                'reptile': summaries.get(row.reptile_id)
+            })
+        } for row in rows]
+
+
+def get_feed(engine):
+    """The process-wide feed for a database engine."""
+    feeds = current_app.extensions['change_feeds']
+    key = str(engine.url)
+    with feeds['lock']:
+        if key not in feeds['by_url']:
+            feeds['by_url'][key] = ChangeFeed(
+                engine,
+                interval=current_app.config['SSE_POLL_INTERVAL'],
+                retention=current_app.config['CHANGE_LOG_RETENTION_SECONDS']
+            )
+        return feeds['by_url'][key]
+
+
+def stream(feed, last_event_id, heartbeat, max_duration):
+    """Generate an SSE stream; clients reconnect with Last-Event-ID after max_duration."""
+    cursor = feed.subscribe(last_event_id)
+    deadline = time.monotonic() + max_duration
+    try:
+        yield f'retry: {RETRY_MS}\n\n'
+        while time.monotonic() < deadline:
+            events, cursor = feed.wait(cursor, heartbeat)
+            if events is None:
+                yield 'event: resync\ndata: {}\n\n'
+                return
+            if not events:
+                yield ': keepalive\n\n'
+            for e in events:
+                yield f"id: {e['id']}\nevent: change\ndata: {e['data']}\n\n"
+    finally:
+        feed.unsubscribe()
+
+
+def busy():
+    """SSE body telling a client to reconnect later, jittered so retries spread out."""
+    return f'retry: {random.randint(*BUSY_RETRY_MS)}\n\n'
+
+
+def init_app(app):
+    """Record changes to reptiles and records in the change log."""
+    global retention_seconds
+    retention_seconds = app.config['CHANGE_LOG_RETENTION_SECONDS']
+    app.extensions['change_feeds'] = {
+        'lock': threading.Lock(),
+        'by_url': {},
+        # Each open stream holds a worker thread; keep some for ordinary requests
+        'streams': threading.BoundedSemaphore(app.config['SSE_MAX_STREAMS'])
+    }
+    for model in (Reptile, *RECORD_MODELS.values()):
+        for identifier, listener in LISTENERS:
+            if not event.contains(model, identifier, listener):
+                event.listen(model, identifier, listener)
+
+    @app.cli.command('prune-change-log')
+    @click.option('--tenant', default=None, help='Prune only this collection.')
+    @click.option('--all-tenants', is_flag=True, help='Also prune every collection.')
+    @click.option('--workers', type=int, default=None)
+    def prune_command(tenant, all_tenants, workers):
+        """Delete live-update events older than CHANGE_LOG_RETENTION_SECONDS."""
+        retention = app.config['CHANGE_LOG_RETENTION_SECONDS']
+        tenants = tenancy.tenant_paths(app, tenant, all_tenants)
+
+        if tenant is None:
+            with db.engine.begin() as conn:
+                print(f'{prune_change_log(conn, retention)} events removed')
+        results = tenancy.fan_out(prune_database, [path for _, path in tenants],
+                                  [retention] * len(tenants), workers=workers)
+        for (slug, _), removed in zip(tenants, results):
+            print(f'{slug}: {removed} events removed')
@@ -0,0 +1,43 @@
+# Data export for HerpTracker
+import csv
+import io
+import zipfile
+
+from app.models import Reptile, Feeding, Shedding, Measurement, Defecation, Breeding, Cleaning
+from app.archive import RECORD_MODELS, iter_archived_rows
+
+# Models to export, keyed by CSV name
+EXPORT_MODELS = {
+    'reptiles': Reptile,
+    'feedings': Feeding,
+    'sheddings': Shedding,
+    'measurements': Measurement,
+    'defecations': Defecation,
+    'breedings': Breeding,
+    'cleanings': Cleaning
+}
+
+
+def write_export(fileobj, session):
+    """Write a ZIP of one CSV per table, read through ``session``."""
+    with zipfile.ZipFile(fileobj, 'w', zipfile.ZIP_DEFLATED) as zf:
+        for name, model in EXPORT_MODELS.items():
+            # Create CSV in memory
+            csv_buffer = io.StringIO()
+            writer = csv.writer(csv_buffer)
+
+            # Get column headers
+            columns = [c.name for c in model.__table__.columns]
+            writer.writerow(columns)
+
+            # Write data rows
+            for record in session.query(model).yield_per(500):
+                writer.writerow([getattr(record, col) for col in columns])
+
+            # Include records moved to archive storage
+            if name in RECORD_MODELS:
+                for row in iter_archived_rows(name, session):
+                    writer.writerow([row[col] for col in columns])
+
+            # Add to ZIP
+            zf.writestr(f'{name}.csv', csv_buffer.getvalue())
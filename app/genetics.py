@@ -0,0 +1,236 @@
+# Morph genetics for HerpTracker
+import json
+import re
+from functools import lru_cache
+
+RECESSIVE = 'recessive'
+CODOMINANT = 'codominant'
+DOMINANT = 'dominant'
+INHERITANCE_TYPES = (RECESSIVE, CODOMINANT, DOMINANT)
+
+# Default trait catalog. Override with a JSON list of the same shape via GENETICS_CATALOG_PATH.
+DEFAULT_TRAITS = [
+    # Ball pythons
+    {'name': 'Albino', 'inheritance': RECESSIVE},
+    {'name': 'Axanthic', 'inheritance': RECESSIVE},
+    {'name': 'Clown', 'inheritance': RECESSIVE},
+    {'name': 'Desert Ghost', 'inheritance': RECESSIVE},
+    {'name': 'Hypo', 'inheritance': RECESSIVE, 'aliases': ['Ghost']},
+    {'name': 'Lavender Albino', 'inheritance': RECESSIVE, 'aliases': ['Lavender']},
+    {'name': 'Piebald', 'inheritance': RECESSIVE, 'aliases': ['Pied']},
+    {'name': 'Banana', 'inheritance': CODOMINANT, 'aliases': ['Coral Glow']},
+    {'name': 'Black Pastel', 'inheritance': CODOMINANT},
+    {'name': 'Butter', 'inheritance': CODOMINANT},
+    {'name': 'Cinnamon', 'inheritance': CODOMINANT},
+    {'name': 'Enchi', 'inheritance': CODOMINANT},
+    {'name': 'Fire', 'inheritance': CODOMINANT, 'super': 'Black Eyed Leucistic'},
+    {'name': 'Lesser', 'inheritance': CODOMINANT},
+    {'name': 'Mojave', 'inheritance': CODOMINANT},
+    {'name': 'Pastel', 'inheritance': CODOMINANT},
+    {'name': 'Yellow Belly', 'inheritance': CODOMINANT, 'super': 'Ivory', 'aliases': ['YB']},
+    {'name': 'Pinstripe', 'inheritance': DOMINANT, 'aliases': ['Pin']},
+    {'name': 'Spider', 'inheritance': DOMINANT},
+    # Leopard geckos
+    {'name': 'Bell Albino', 'inheritance': RECESSIVE},
+    {'name': 'Eclipse', 'inheritance': RECESSIVE},
+    {'name': 'Murphy Patternless', 'inheritance': RECESSIVE},
+    {'name': 'Rainwater Albino', 'inheritance': RECESSIVE},
+    {'name': 'Tremper Albino', 'inheritance': RECESSIVE},
+    {'name': 'Mack Snow', 'inheritance': CODOMINANT},
+    {'name': 'Enigma', 'inheritance': DOMINANT},
+    {'name': 'White and Yellow', 'inheritance': DOMINANT, 'aliases': ['W&Y', 'WY']},
+]
+
+POSSIBLE_HET = 0.5
+TOKEN = re.compile(r"\d+(?:\.\d+)?%|[a-z0-9&']+")
+
+
+def _words(text):
+    return tuple(TOKEN.findall(text.lower()))
+
+
+@lru_cache(maxsize=1024)
+def gene_outcomes(inheritance, pa, pb):
+    """Copy-count distribution of one gene in the offspring.
+
+    ``pa``/``pb`` are the probabilities that each parent passes on the mutant
+    allele. Returns ``((copies, probability), ...)`` for non-zero outcomes.
+    """
+    two = pa * pb
+    one = pa * (1 - pb) + pb * (1 - pa)
+    zero = (1 - pa) * (1 - pb)
+    return tuple((copies, p) for copies, p in ((0, zero), (1, one), (2, two)) if p > 0)
+
+
+class Genotype(tuple):
+    """Hashable genotype: sorted ``(gene, transmit probability)`` pairs."""
+
+    @property
+    def genes(self):
+        return dict(self)
+
+
+class TraitCatalog:
+    """Trait catalog that parses mutation strings and predicts pairings.
+
+    Parsed genotypes, pairing results and partial pairings are memoized in
+    bounded LRU caches, so evaluating a full male x female matrix only does
+    the work once per distinct genotype pair and worker memory stays flat.
+    """
+
+    def __init__(self, traits=None, cache_size=8192):
+        self.traits = {}
+        self._phrases = {}
+        for trait in traits or DEFAULT_TRAITS:
+            if trait['inheritance'] not in INHERITANCE_TYPES:
+                raise ValueError(f"Unknown inheritance for {trait['name']}: {trait['inheritance']}")
+            self.traits[trait['name']] = trait
+            for alias in [trait['name']] + trait.get('aliases', []):
+                self._phrases[_words(alias)] = (trait['name'], False)
+                self._phrases[('super',) + _words(alias)] = (trait['name'], True)
+            if trait.get('super'):
+                self._phrases[_words(trait['super'])] = (trait['name'], True)
+        self._longest = max(len(phrase) for phrase in self._phrases)
+
+        # lru_cache is thread-safe; a miss racing another thread just computes twice
+        self._parse = lru_cache(maxsize=cache_size)(self._parse)
+        self._pair = lru_cache(maxsize=cache_size)(self._pair)
+        self._combine = lru_cache(maxsize=cache_size)(self._combine)
+        self.gene_table = lru_cache(maxsize=cache_size)(self.gene_table)
+
+    @classmethod
+    def from_file(cls, path, **kwargs):
+        with open(path) as f:
+            return cls(json.load(f), **kwargs)
+
+    # ============ Parsing ============
+
+    def _match(self, words, i):
+        for length in range(min(self._longest, len(words) - i), 0, -1):
+            match = self._phrases.get(words[i:i + length])
+            if match:
+                return match, length
+        return (None, False), 1
+
+    def parse(self, mutation):
+        """Parse a free-text mutation into ``(Genotype, unknown words)``.
+
+        Understands visual genes ("Pastel Clown"), super forms ("Super Pastel",
+        "Ivory"), hets ("het Clown Pied" - everything after "het" is het) and
+        possible hets ("66% het Clown", "pos het Pied").
+        """
+        return self._parse((mutation or '').strip().lower())
+
+    def _parse(self, key):
+        alleles, unknown = {}, []
+        words = _words(key)
+        het, het_probability = False, 1.0
+        i = 0
+        while i < len(words):
+            word = words[i]
+            if word.endswith('%'):
+                het_probability = float(word[:-1]) / 100
+                i += 1
+                continue
+            if word in ('pos', 'poss', 'possible'):
+                het_probability = POSSIBLE_HET
+                i += 1
+                continue
+            if word == 'het':
+                het = True
+                i += 1
+                continue
+            if word in ('normal', 'double', 'triple', 'quad', 'visual', 'and'):
+                i += 1
+                continue
+
+            (gene, is_super), length = self._match(words, i)
+            if gene is None:
+                unknown.append(word)
+            elif het:
+                alleles[gene] = 0.5 * het_probability
+            elif is_super or self.traits[gene]['inheritance'] == RECESSIVE:
+                alleles[gene] = 1.0
+            else:
+                alleles[gene] = 0.5
+            i += length
+
+        return Genotype(sorted(alleles.items())), tuple(unknown)
+
+    # ============ Pairing ============
+
+    def _label(self, gene, copies):
+        trait = self.traits[gene]
+        if trait['inheritance'] == RECESSIVE:
+            return (gene, True) if copies == 2 else (f'het {gene}', False)
+        if trait['inheritance'] == CODOMINANT and copies == 2:
+            return (trait.get('super') or f'Super {gene}', True)
+        return (gene, True)
+
+    def gene_table(self, gene, pa, pb):
+        """One gene's offspring outcomes: ``((label, visual, probability), ...)``.
+
+        ``label`` is None for offspring that don't inherit the gene.
+        """
+        outcomes = {}
+        for copies, p in gene_outcomes(self.traits[gene]['inheritance'], pa, pb):
+            key = self._label(gene, copies) if copies else (None, False)
+            outcomes[key] = outcomes.get(key, 0.0) + p
+        return tuple((label, visual, p) for (label, visual), p in outcomes.items())
+
+    def factors(self, sire, dam):
+        """Independent per-gene factors of a pairing: ``((gene, pa, pb), ...)``.
+
+        The offspring distribution is the product of ``gene_table(*factor)``
+        over these factors; pair() expands that product into combined labels.
+        """
+        sire_genes, dam_genes = dict(sire), dict(dam)
+        return tuple((gene, sire_genes.get(gene, 0.0), dam_genes.get(gene, 0.0))
+                     for gene in sorted(set(sire_genes) | set(dam_genes)))
+
+    def _combine(self, factors):
+        """Joint distribution ``{(visual labels, het labels): probability}`` of ``factors``.
+
+        Folds one gene at a time and is memoized on the factor prefix, so
+        pairings that share leading genes share the work. Callers must not
+        modify the result.
+        """
+        if not factors:
+            return {((), ()): 1.0}
+        distribution = {}
+        table = self.gene_table(*factors[-1])
+        for (visuals, hets), p in self._combine(factors[:-1]).items():
+            for label, visual, q in table:
+                if label is None:
+                    key = (visuals, hets)
+                elif visual:
+                    key = (visuals + (label,), hets)
+                else:
+                    key = (visuals, hets + (label,))
+                distribution[key] = distribution.get(key, 0.0) + p * q
+        return distribution
+
+    def pair(self, sire, dam):
+        """Offspring outcomes for two genotypes, most likely first.
+
+        Returns ``((label, probability), ...)``. Recessive genes carried in a
+        single copy show up as "het <gene>" after the visual traits.
+        """
+        return self._pair(sire, dam) if sire <= dam else self._pair(dam, sire)
+
+    def _pair(self, sire, dam):
+        totals = {}
+        for (visuals, hets), p in self._combine(self.factors(sire, dam)).items():
+            label = ' '.join(visuals + hets) or 'Normal'
+            totals[label] = totals.get(label, 0.0) + p
+
+        return tuple(sorted(((label, round(p, 6)) for label, p in totals.items()),
+                            key=lambda item: (-item[1], item[0])))
+
+
+def init_app(app):
+    """Load the trait catalog."""
+    path = app.config.get('GENETICS_CATALOG_PATH')
+    cache_size = app.config['GENETICS_CACHE_SIZE']
+    app.extensions['trait_catalog'] = (TraitCatalog.from_file(path, cache_size=cache_size) if path
+                                       else TraitCatalog(cache_size=cache_size))
@@ -6,13 +6,17 @@ from app import db
 class Reptile(db.Model):
     """Reptile model - main entity for tracking."""
     __tablename__ = 'reptiles'
+    __table_args__ = (
+        # Case-insensitive name search and ordering (LIKE 'prefix%' uses this index)
+        db.Index('ix_reptiles_name_nocase', db.text('name COLLATE NOCASE')),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), nullable=False)
     date_of_birth = db.Column(db.Date, nullable=True)
-    species = db.Column(db.String(100), nullable=False)
-    mutation = db.Column(db.String(200), nullable=True)
-    gender = db.Column(db.String(20), nullable=True)
+    species = db.Column(db.String(100), nullable=False, index=True)
+    mutation = db.Column(db.String(200), nullable=True, index=True)
+    gender = db.Column(db.String(20), nullable=True, index=True)
     image_path = db.Column(db.String(255), nullable=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
@@ -30,6 +34,8 @@ class Reptile(db.Model):
                                 cascade='all, delete-orphan', order_by='desc(Breeding.recorded_at)')
     cleanings = db.relationship('Cleaning', backref='reptile', lazy='dynamic',
                                 cascade='all, delete-orphan', order_by='desc(Cleaning.recorded_at)')
+    archives = db.relationship('RecordArchive', backref='reptile', lazy='dynamic',
+                               cascade='all, delete-orphan')
     
     def days_since_last_feeding(self):
         """Calculate days since last feeding."""
@@ -95,6 +101,7 @@ class Reptile(db.Model):
 class Feeding(db.Model):
     """Feeding record - immutable."""
     __tablename__ = 'feedings'
+    __table_args__ = (db.Index('ix_feedings_reptile_recorded', 'reptile_id', 'recorded_at'),)
     
     id = db.Column(db.Integer, primary_key=True)
     reptile_id = db.Column(db.Integer, db.ForeignKey('reptiles.id'), nullable=False)
@@ -115,6 +122,7 @@ class Feeding(db.Model):
 class Shedding(db.Model):
     """Shedding record - immutable."""
     __tablename__ = 'sheddings'
+    __table_args__ = (db.Index('ix_sheddings_reptile_recorded', 'reptile_id', 'recorded_at'),)
     
     id = db.Column(db.Integer, primary_key=True)
     reptile_id = db.Column(db.Integer, db.ForeignKey('reptiles.id'), nullable=False)
@@ -135,6 +143,7 @@ class Shedding(db.Model):
 class Measurement(db.Model):
     """Size measurement record - immutable."""
     __tablename__ = 'measurements'
+    __table_args__ = (db.Index('ix_measurements_reptile_recorded', 'reptile_id', 'recorded_at'),)
     
     id = db.Column(db.Integer, primary_key=True)
     reptile_id = db.Column(db.Integer, db.ForeignKey('reptiles.id'), nullable=False)
@@ -157,6 +166,7 @@ class Measurement(db.Model):
 class Defecation(db.Model):
     """Defecation record - immutable."""
     __tablename__ = 'defecations'
+    __table_args__ = (db.Index('ix_defecations_reptile_recorded', 'reptile_id', 'recorded_at'),)
     
     id = db.Column(db.Integer, primary_key=True)
     reptile_id = db.Column(db.Integer, db.ForeignKey('reptiles.id'), nullable=False)
@@ -175,6 +185,7 @@ class Defecation(db.Model):
 class Breeding(db.Model):
     """Breeding record."""
     __tablename__ = 'breedings'
+    __table_args__ = (db.Index('ix_breedings_reptile_recorded', 'reptile_id', 'recorded_at'),)
     
     id = db.Column(db.Integer, primary_key=True)
     reptile_id = db.Column(db.Integer, db.ForeignKey('reptiles.id'), nullable=False)
@@ -193,6 +204,7 @@ class Breeding(db.Model):
 class Cleaning(db.Model):
     """Cage cleaning record."""
     __tablename__ = 'cleanings'
+    __table_args__ = (db.Index('ix_cleanings_reptile_recorded', 'reptile_id', 'recorded_at'),)
     
     id = db.Column(db.Integer, primary_key=True)
     reptile_id = db.Column(db.Integer, db.ForeignKey('reptiles.id'), nullable=False)
@@ -208,3 +220,45 @@ class Cleaning(db.Model):
             'cleaning_type': self.cleaning_type,
             'notes': self.notes
         }
+
+
+class RecordArchive(db.Model):
+    """Compressed, column-encoded block of old records for one reptile and year."""
+    __tablename__ = 'record_archives'
+    __table_args__ = (db.UniqueConstraint('reptile_id', 'record_type', 'year'),)
+    
+    id = db.Column(db.Integer, primary_key=True)
+    reptile_id = db.Column(db.Integer, db.ForeignKey('reptiles.id'), nullable=False)
+    record_type = db.Column(db.String(50), nullable=False)  # table name, e.g. 'cleanings'
+    year = db.Column(db.Integer, nullable=False)
+    row_count = db.Column(db.Integer, nullable=False, default=0)
+    payload = db.Column(db.LargeBinary, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+class ChangeEvent(db.Model):
+    """Change log entry, polled by every worker to push live updates (see app/events.py)."""
+    __tablename__ = 'change_events'
+    # Never reuse ids after pruning: clients resume from the last id they saw
+    __table_args__ = {'sqlite_autoincrement': True}
+    
+    id = db.Column(db.Integer, primary_key=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False, index=True)
+    action = db.Column(db.String(20), nullable=False)  # 'created', 'updated' or 'deleted'
+    record_type = db.Column(db.String(50), nullable=False)  # table name, e.g. 'feedings'
+    record_id = db.Column(db.Integer, nullable=False)
+    reptile_id = db.Column(db.Integer, nullable=True)  # no foreign key: outlives deleted reptiles
+    payload = db.Column(db.Text, nullable=True)  # JSON
+
+
+def init_schema(engine):
+    """Create missing tables, and indexes added to tables that already exist."""
+    # WAL lets snapshots and other long reads run without blocking writers
+    if engine.dialect.name == 'sqlite':
+        with engine.connect() as conn:
+            conn.exec_driver_sql('PRAGMA journal_mode=WAL')
+    db.metadata.create_all(engine)
+    for table in db.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(engine, checkfirst=True)
@@ -1,14 +1,15 @@
 # Routes for HerpTracker
 import os
 import uuid
-import csv
 import io
-import zipfile
-from datetime import datetime
-from flask import Blueprint, render_template, request, jsonify, current_app, redirect, url_for, send_file
+from datetime import datetime, timedelta
+from flask import Blueprint, render_template, request, jsonify, current_app, redirect, url_for, send_file, Response
 from werkzeug.utils import secure_filename
 from app import db
 from app.models import Reptile, Feeding, Shedding, Measurement, Defecation, Breeding, Cleaning
+from app.archive import RECORD_MODELS, history
+from app.export import write_export
+from app import events, snapshots, tenancy
 
 main = Blueprint('main', __name__)
 
@@ -25,26 +26,95 @@ def save_image(file):
         # Generate unique filename
         ext = file.filename.rsplit('.', 1)[1].lower()
         filename = f"{uuid.uuid4().hex}.{ext}"
+        
+        # Each collection gets its own upload directory
+        tenant = tenancy.current_tenant()
+        if tenant:
+            os.makedirs(os.path.join(current_app.config['UPLOAD_FOLDER'], tenant), exist_ok=True)
+            filename = f"{tenant}/{filename}"
+        
         filepath = os.path.join(current_app.config['UPLOAD_FOLDER'], filename)
         file.save(filepath)
         return filename
     return None
 
 
+def save_record(record):
+    """Insert a new record, through the group-commit queue when it is enabled."""
+    queue = current_app.extensions.get('write_queue')
+    if queue is None:
+        db.session.add(record)
+        db.session.commit()
+        return
+    
+    def on_insert(connection, primary_key):
+        # ORM events don't fire for queued inserts, so log the change here
+        record.id = primary_key
+        events.record_change(connection, 'created', record)
+    
+    values = {c.name: getattr(record, c.name) for c in record.__table__.columns
+              if getattr(record, c.name) is not None}
+    engine = db.session.get_bind()
+    # Give our pooled connection back first: the writer needs one from the same pool
+    db.session.close()
+    record.id = queue.submit(engine, record.__table__, values, on_insert)
+
+
 # ============ Page Routes ============
 
+def _distinct_values(column):
+    """Distinct non-empty values of an indexed column, for filter dropdowns."""
+    return [value for (value,) in db.session.query(column).filter(column.isnot(None), column != '')
+            .distinct().order_by(column)]
+
+
 @main.route('/')
 def index():
-    """Dashboard - show all reptiles."""
-    reptiles = Reptile.query.order_by(Reptile.name).all()
-    return render_template('index.html', reptiles=reptiles)
+    """Dashboard - show reptiles, filtered and paginated."""
+    filters = {key: request.args.get(key, '').strip() for key in ('q', 'species', 'gender', 'mutation', 'sort')}
+    filters['overdue'] = '1' if request.args.get('overdue') else ''
+    
+    last_fed = db.select(db.func.max(Feeding.recorded_at)) \
+        .where(Feeding.reptile_id == Reptile.id).correlate(Reptile).scalar_subquery()
+    
+    query = db.select(Reptile)
+    if filters['q']:
+        # Case-insensitive prefix match served by ix_reptiles_name_nocase
+        escaped = filters['q'].replace('/', '//').replace('%', '/%').replace('_', '/_')
+        query = query.where(Reptile.name.like(escaped + '%', escape='/'))
+    for key in ('species', 'gender', 'mutation'):
+        if filters[key]:
+            query = query.where(getattr(Reptile, key) == filters[key])
+    if filters['overdue']:
+        # Same rule as the cards: days_since_last_feeding() > FEEDING_OVERDUE_DAYS
+        cutoff = datetime.utcnow() - timedelta(days=current_app.config['FEEDING_OVERDUE_DAYS'] + 1)
+        query = query.where(db.or_(last_fed.is_(None), last_fed <= cutoff))
+    
+    if filters['sort'] == 'fed':
+        # Never fed first, then longest since last feeding
+        query = query.order_by(last_fed.asc(), Reptile.name.collate('NOCASE'))
+    else:
+        query = query.order_by(Reptile.name.collate('NOCASE'))
+    
+    page = db.paginate(query, per_page=current_app.config['DASHBOARD_PAGE_SIZE'], max_per_page=100)
+    
+    return render_template(
+        'index.html',
+        reptiles=page.items,
+        page=page,
+        filters={key: value for key, value in filters.items() if value},
+        species_options=_distinct_values(Reptile.species),
+        gender_options=_distinct_values(Reptile.gender),
+        mutation_options=_distinct_values(Reptile.mutation)
+    )
 
 
 @main.route('/reptile/<int:reptile_id>')
 def reptile_detail(reptile_id):
     """Reptile profile page."""
     reptile = Reptile.query.get_or_404(reptile_id)
-    return render_template('reptile.html', reptile=reptile)
+    records = {record_type: history(reptile, record_type) for record_type in RECORD_MODELS}
+    return render_template('reptile.html', reptile=reptile, records=records)
 
 
 @main.route('/reptile/new')
@@ -66,36 +136,9 @@ def edit_reptile(reptile_id):
 def export_data():
     """Export all data as a ZIP file containing CSVs."""
     memory_file = io.BytesIO()
-    
-    with zipfile.ZipFile(memory_file, 'w', zipfile.ZIP_DEFLATED) as zf:
-        # Define models to export
-        models = {
-            'reptiles': Reptile,
-            'feedings': Feeding,
-            'sheddings': Shedding,
-            'measurements': Measurement,
-            'defecations': Defecation,
-            'breedings': Breeding,
-            'cleanings': Cleaning
-        }
-        
-        for name, model in models.items():
-            # Create CSV in memory
-            csv_buffer = io.StringIO()
-            writer = csv.writer(csv_buffer)
-            
-            # Get column headers
-            columns = [c.name for c in model.__table__.columns]
-            writer.writerow(columns)
-            
-            # Write data rows
-            records = model.query.all()
-            for record in records:
-                writer.writerow([getattr(record, col) for col in columns])
-                
-            # Add to ZIP
-            zf.writestr(f'{name}.csv', csv_buffer.getvalue())
-    
+    # Read a consistent snapshot instead of the live database
+    with snapshots.snapshot_session() as session:
+        write_export(memory_file, session)
     memory_file.seek(0)
     
     return send_file(
@@ -221,8 +264,7 @@ def add_feeding(reptile_id):
             notes=request.form.get('notes')
         )
         
-        db.session.add(feeding)
-        db.session.commit()
+        save_record(feeding)
         
         return jsonify({'success': True, 'feeding': feeding.to_dict()}), 201
     except Exception as e:
@@ -247,8 +289,7 @@ def add_shedding(reptile_id):
             notes=request.form.get('notes')
         )
         
-        db.session.add(shedding)
-        db.session.commit()
+        save_record(shedding)
         
         return jsonify({'success': True, 'shedding': shedding.to_dict()}), 201
     except Exception as e:
@@ -274,8 +315,7 @@ def add_measurement(reptile_id):
             notes=request.form.get('notes')
         )
         
-        db.session.add(measurement)
-        db.session.commit()
+        save_record(measurement)
         
         return jsonify({'success': True, 'measurement': measurement.to_dict()}), 201
     except Exception as e:
@@ -299,8 +339,7 @@ def add_defecation(reptile_id):
             notes=request.form.get('notes')
         )
         
-        db.session.add(defecation)
-        db.session.commit()
+        save_record(defecation)
         
         return jsonify({'success': True, 'defecation': defecation.to_dict()}), 201
     except Exception as e:
@@ -324,8 +363,7 @@ def add_breeding(reptile_id):
             notes=request.form.get('notes')
         )
         
-        db.session.add(breeding)
-        db.session.commit()
+        save_record(breeding)
         
         return jsonify({'success': True, 'breeding': breeding.to_dict()}), 201
     except Exception as e:
@@ -350,8 +388,7 @@ def add_cleaning(reptile_id):
             notes=request.form.get('notes')
         )
         
-        db.session.add(cleaning)
-        db.session.commit()
+        save_record(cleaning)
         
         return jsonify({'success': True, 'cleaning': cleaning.to_dict()}), 201
     except Exception as e:
@@ -561,14 +598,106 @@ def delete_cleaning(record_id):
 
 @main.route('/api/reptile/<int:reptile_id>/records')
 def get_records(reptile_id):
-    """Get all records for a reptile."""
+    """Get all records for a reptile, including archived ones."""
     reptile = Reptile.query.get_or_404(reptile_id)
     
     return jsonify({
-        'feedings': [f.to_dict() for f in reptile.feedings.limit(50).all()],
-        'sheddings': [s.to_dict() for s in reptile.sheddings.limit(50).all()],
-        'measurements': [m.to_dict() for m in reptile.measurements.limit(50).all()],
-        'defecations': [d.to_dict() for d in reptile.defecations.limit(50).all()],
-        'breedings': [b.to_dict() for b in reptile.breedings.limit(50).all()],
-        'cleanings': [c.to_dict() for c in reptile.cleanings.limit(50).all()]
+        record_type: [r.to_dict() for r in history(reptile, record_type)]
+        for record_type in RECORD_MODELS
+    })
+
+
+# ============ API Routes - Genetics ============
+
+@main.route('/api/pairings')
+def get_pairings():
+    """Predict offspring for every male x female pairing within a species.
+    
+    Genes are inherited independently, so each pairing lists indexes into
+    ``genes``, one per-gene outcome table per distinct (gene, sire, dam)
+    combination; the offspring distribution is the product of those tables.
+    This keeps the matrix linear in the number of genes rather than
+    exponential. /api/pairings/<male>/<female> returns the expanded outcomes.
+    """
+    catalog = current_app.extensions['trait_catalog']
+    
+    # Group animals by species and sex, parsing each mutation string once
+    animals = {}
+    groups = {}
+    query = db.session.query(Reptile.id, Reptile.name, Reptile.species, Reptile.gender, Reptile.mutation) \
+        .filter(Reptile.gender.in_(['Male', 'Female']))
+    if request.args.get('species'):
+        query = query.filter(db.func.lower(Reptile.species) == request.args['species'].lower())
+    
+    for row in query.order_by(Reptile.name):
+        genotype, unknown_words = catalog.parse(row.mutation)
+        animals[row.id] = {
+            'name': row.name,
+            'species': row.species,
+            'gender': row.gender,
+            'mutation': row.mutation,
+            'unrecognized': ' '.join(unknown_words) or None
+        }
+        species = groups.setdefault(row.species.strip().lower(), {'Male': [], 'Female': []})
+        species[row.gender].append((row.id, genotype))
+    
+    tables = []
+    table_index = {}
+    pairings = []
+    for species in groups.values():
+        for male_id, sire in species['Male']:
+            for female_id, dam in species['Female']:
+                indexes = []
+                for factor in catalog.factors(sire, dam):
+                    if factor not in table_index:
+                        table_index[factor] = len(tables)
+                        tables.append({
+                            'gene': factor[0],
+                            'outcomes': [{'traits': label, 'visual': visual, 'probability': round(p, 6)}
+                                         for label, visual, p in catalog.gene_table(*factor)]
+                        })
+                    indexes.append(table_index[factor])
+                pairings.append({'male': male_id, 'female': female_id, 'genes': indexes})
+    
+    return jsonify({'animals': animals, 'genes': tables, 'pairings': pairings})
+
+
+@main.route('/api/pairings/<int:male_id>/<int:female_id>')
+def get_pairing(male_id, female_id):
+    """Expanded offspring outcomes for one pairing, most likely first."""
+    catalog = current_app.extensions['trait_catalog']
+    male = Reptile.query.get_or_404(male_id)
+    female = Reptile.query.get_or_404(female_id)
+    
+    result = catalog.pair(catalog.parse(male.mutation)[0], catalog.parse(female.mutation)[0])
+    return jsonify({
+        'male': male_id,
+        'female': female_id,
+        'outcomes': [{'traits': label, 'probability': p} for label, p in result]
+    })
+
+
+# ============ API Routes - Live Updates ============
+
+@main.route('/api/events')
+def event_stream():
+    """Server-Sent Events stream of reptile and record changes."""
+    slots = current_app.extensions['change_feeds']['streams']
+    if not slots.acquire(blocking=False):
+        # Every stream slot in this worker is taken. EventSource stops for good
+        # on an error status, so answer 200 with a retry delay and close.
+        return Response(events.busy(), mimetype='text/event-stream', headers={'Cache-Control': 'no-cache'})
+    
+    feed = events.get_feed(db.session.get_bind())
+    stream = events.stream(
+        feed,
+        request.headers.get('Last-Event-ID', type=int),
+        heartbeat=current_app.config['SSE_HEARTBEAT_SECONDS'],
+        max_duration=current_app.config['SSE_MAX_STREAM_SECONDS']
+    )
+    response = Response(stream, mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
     })
+    response.call_on_close(slots.release)
+    return response
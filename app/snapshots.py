@@ -0,0 +1,331 @@
+# Point-in-time database snapshots for HerpTracker
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+import click
+from flask import current_app
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - not available on Windows
+    fcntl = None
+
+from app import events, tenancy
+
+PREFIX = 'snapshot-'
+SUFFIX = '.db'
+ON_DEMAND = 'on-demand'  # subdirectory for snapshots taken for reads, rotated separately
+PRUNE_INTERVAL = 10 * 60  # seconds between change log retention passes by the scheduler
+STAMP_FORMAT = '%Y%m%dT%H%M%S%fZ'
+
+
+# ============ Taking Snapshots ============
+
+def database_path(engine):
+    """File path of a SQLite engine's database, or None if it has no file."""
+    path = engine.url.database
+    if engine.dialect.name != 'sqlite' or not path or path == ':memory:':
+        return None
+    return path
+
+
+def snapshot_dir(base, tenant=None):
+    """Directory holding the scheduled snapshots of the default collection or a tenant.
+
+    Snapshots taken on demand for reads go in its ``on-demand`` subdirectory.
+    """
+    return base if tenant is None else os.path.join(base, 'tenants', tenant)
+
+
+def list_snapshots(directory):
+    """``(taken_at, path)`` for every snapshot in ``directory``, newest first."""
+    if not os.path.isdir(directory):
+        return []
+    snapshots = []
+    for name in os.listdir(directory):
+        if not (name.startswith(PREFIX) and name.endswith(SUFFIX)):
+            continue
+        try:
+            taken_at = datetime.strptime(name[len(PREFIX):-len(SUFFIX)], STAMP_FORMAT)
+        except ValueError:
+            continue
+        snapshots.append((taken_at, os.path.join(directory, name)))
+    return sorted(snapshots, reverse=True)
+
+
+def take_snapshot(source, directory):
+    """Copy the database at ``source`` into a new snapshot and return its path.
+
+    VACUUM INTO copies the database inside one read transaction, so the
+    snapshot is consistent and, in WAL mode, writers are never blocked. The
+    file only gets its snapshot name once it is complete.
+    """
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f'{PREFIX}{datetime.utcnow().strftime(STAMP_FORMAT)}{SUFFIX}')
+    partial = path + '.partial'
+
+    conn = sqlite3.connect(source, timeout=30)
+    try:
+        if sqlite3.sqlite_version_info >= (3, 27):
+            conn.execute('VACUUM INTO ?', (partial,))
+        else:
+            target = sqlite3.connect(partial)
+            try:
+                conn.backup(target)
+            finally:
+                target.close()
+    finally:
+        conn.close()
+
+    # Snapshots are opened read-only, which WAL mode does not allow
+    target = sqlite3.connect(partial)
+    try:
+        target.execute('PRAGMA journal_mode=DELETE')
+    finally:
+        target.close()
+
+    os.replace(partial, path)
+    return path
+
+
+def prune_snapshots(directory, keep, keep_daily):
+    """Delete old snapshots and return their paths.
+
+    Keeps the newest ``keep`` snapshots, plus the newest snapshot of each of
+    the last ``keep_daily`` days.
+    """
+    snapshots = list_snapshots(directory)
+    kept = {path for _, path in snapshots[:max(keep, 1)]}
+    cutoff = (datetime.utcnow() - timedelta(days=keep_daily)).date()
+    days = set()
+    for taken_at, path in snapshots:
+        day = taken_at.date()
+        if day > cutoff and day not in days:
+            days.add(day)
+            kept.add(path)
+
+    removed = [path for _, path in snapshots if path not in kept]
+    for path in removed:
+        os.remove(path)
+    return removed
+
+
+@contextmanager
+def _directory_lock(directory):
+    # Serialize snapshots of one database across worker processes
+    os.makedirs(directory, exist_ok=True)
+    with open(os.path.join(directory, '.lock'), 'w') as f:
+        if fcntl is not None:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        yield
+
+
+def ensure_snapshot(source, directory, max_age, keep, keep_daily):
+    """Path of a snapshot no older than ``max_age`` seconds, taking one if needed."""
+    def fresh():
+        snapshots = list_snapshots(directory)
+        if snapshots and (datetime.utcnow() - snapshots[0][0]).total_seconds() <= max_age:
+            return snapshots[0][1]
+        return None
+
+    path = fresh()
+    if path is None:
+        with _directory_lock(directory):
+            path = fresh()
+            if path is None:
+                path = take_snapshot(source, directory)
+                prune_snapshots(directory, keep, keep_daily)
+    return path
+
+
+def _snapshot_database(source, directory, keep, keep_daily):
+    with _directory_lock(directory):
+        path = take_snapshot(source, directory)
+        prune_snapshots(directory, keep, keep_daily)
+    return path
+
+
+def _databases(app, tenant=None, all_tenants=False):
+    """``(source, snapshot directory)`` pairs for the default collection and/or tenants."""
+    from app import db
+
+    base = app.config['SNAPSHOT_DIR']
+    engines = app.extensions['tenant_engines']
+    if tenant is not None:
+        if not tenancy.TENANT_SLUG.match(tenant) or not engines.exists(tenant):
+            raise click.BadParameter(f'no such collection: {tenant}', param_hint='--tenant')
+        return [(engines.path(tenant), snapshot_dir(base, tenant))]
+
+    databases = []
+    source = database_path(db.engine)
+    if source is not None:
+        databases.append((source, snapshot_dir(base)))
+    if all_tenants:
+        databases += [(engines.path(slug), snapshot_dir(base, slug)) for slug in engines.slugs()]
+    return databases
+
+
+# ============ Reading From Snapshots ============
+
+class SnapshotEngines:
+    """Read-only engines on the newest snapshot of each database."""
+
+    def __init__(self):
+        self._engines = {}  # snapshot directory -> (path, engine)
+        self._lock = threading.Lock()
+
+    def get(self, directory, path):
+        with self._lock:
+            entry = self._engines.get(directory)
+            if entry is not None and entry[0] == path:
+                return entry[1]
+            engine = create_engine(f'sqlite:///file:{path}?mode=ro&uri=true')
+            self._engines[directory] = (path, engine)
+        # A newer snapshot replaced this one; connections in use close when returned
+        if entry is not None:
+            entry[1].dispose()
+        return engine
+
+
+@contextmanager
+def snapshot_session():
+    """Session reading a recent snapshot of the current request's collection.
+
+    Takes a snapshot first if the newest one is older than
+    SNAPSHOT_MAX_STALENESS_SECONDS, so reads are never staler than that. Falls
+    back to the live session when snapshots are disabled or the database is
+    not a file.
+    """
+    from app import db
+
+    config = current_app.config
+    source = database_path(db.session.get_bind())
+    if not config['SNAPSHOTS_ENABLED'] or source is None:
+        yield db.session
+        return
+
+    directory = snapshot_dir(config['SNAPSHOT_DIR'], tenancy.current_tenant())
+    max_age = config['SNAPSHOT_MAX_STALENESS_SECONDS']
+
+    # A recent scheduled snapshot will do; otherwise take one on demand. Those
+    # have their own rotation so they never push out the scheduled backups.
+    newest = list_snapshots(directory)[:1]
+    if newest and (datetime.utcnow() - newest[0][0]).total_seconds() <= max_age:
+        path = newest[0][1]
+    else:
+        path = ensure_snapshot(source, os.path.join(directory, ON_DEMAND), max_age,
+                               config['SNAPSHOT_ON_DEMAND_KEEP'], 0)
+    engine = current_app.extensions['snapshot_engines'].get(directory, path)
+    with Session(engine) as session:
+        yield session
+
+
+# ============ Schedule ============
+
+class SnapshotScheduler:
+    """Background thread that snapshots every database each SNAPSHOT_INTERVAL_MINUTES.
+
+    Every worker process runs one, but the per-database lock and freshness
+    check mean only one of them copies a given database per interval. It also
+    prunes each database's change log, so idle collections stay small.
+    """
+
+    def __init__(self, app, interval):
+        self.app = app
+        self.interval = interval
+        self.tick = min(60, interval)
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+
+    def ensure_running(self):
+        """Start the thread in this process if needed (before_request hook)."""
+        # Threads do not survive fork(), so start one per worker process
+        if self._pid == os.getpid() and self._thread is not None:
+            return
+        with self._lock:
+            if self._pid != os.getpid() or self._thread is None:
+                self._pid = os.getpid()
+                self._thread = threading.Thread(target=self._run, name='snapshots', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        config = self.app.config
+        last_prune = 0.0
+        while True:
+            prune = time.monotonic() - last_prune >= PRUNE_INTERVAL
+            if prune:
+                last_prune = time.monotonic()
+            with self.app.app_context():
+                for source, directory in _databases(self.app, all_tenants=True):
+                    try:
+                        ensure_snapshot(source, directory, self.interval,
+                                        config['SNAPSHOT_KEEP'], config['SNAPSHOT_KEEP_DAILY'])
+                    except Exception:
+                        self.app.logger.exception('Snapshot of %s failed', source)
+                    if prune:
+                        try:
+                            events.prune_database(source, config['CHANGE_LOG_RETENTION_SECONDS'])
+                        except Exception:
+                            self.app.logger.exception('Pruning the change log of %s failed', source)
+            time.sleep(self.tick)
+
+
+# ============ CLI ============
+
+def init_app(app):
+    """Register snapshot commands and start scheduled snapshots if configured."""
+    app.extensions['snapshot_engines'] = SnapshotEngines()
+
+    interval = app.config['SNAPSHOT_INTERVAL_MINUTES'] * 60
+    if app.config['SNAPSHOTS_ENABLED'] and interval > 0:
+        scheduler = SnapshotScheduler(app, interval)
+        app.before_request(scheduler.ensure_running)
+
+    @app.cli.group('snapshots')
+    def snapshots_group():
+        """Manage point-in-time database snapshots."""
+
+    @snapshots_group.command('create')
+    @click.option('--tenant', default=None, help='Snapshot only this collection.')
+    @click.option('--all-tenants', is_flag=True, help='Also snapshot every collection.')
+    @click.option('--workers', type=int, default=None)
+    def create_command(tenant, all_tenants, workers):
+        """Take a snapshot now and apply retention."""
+        databases = _databases(app, tenant, all_tenants)
+        count = len(databases)
+        for path in tenancy.fan_out(_snapshot_database,
+                                    [source for source, _ in databases],
+                                    [directory for _, directory in databases],
+                                    [app.config['SNAPSHOT_KEEP']] * count,
+                                    [app.config['SNAPSHOT_KEEP_DAILY']] * count,
+                                    workers=workers):
+            print(path)
+
+    @snapshots_group.command('list')
+    @click.option('--tenant', default=None)
+    def list_command(tenant):
+        """List snapshots, newest first."""
+        directory = snapshot_dir(app.config['SNAPSHOT_DIR'], tenant)
+        snapshots = [(taken_at, 'scheduled', path) for taken_at, path in list_snapshots(directory)]
+        snapshots += [(taken_at, ON_DEMAND, path)
+                      for taken_at, path in list_snapshots(os.path.join(directory, ON_DEMAND))]
+        for taken_at, kind, path in sorted(snapshots, reverse=True):
+            print(f'{taken_at:%Y-%m-%d %H:%M:%S} UTC  {kind:<9}  {os.path.getsize(path):>12,} bytes  {path}')
+
+    @snapshots_group.command('prune')
+    @click.option('--tenant', default=None)
+    @click.option('--all-tenants', is_flag=True)
+    def prune_command(tenant, all_tenants):
+        """Delete snapshots outside the retention settings."""
+        for _, directory in _databases(app, tenant, all_tenants):
+            removed = prune_snapshots(directory, app.config['SNAPSHOT_KEEP'], app.config['SNAPSHOT_KEEP_DAILY'])
+            removed += prune_snapshots(os.path.join(directory, ON_DEMAND), app.config['SNAPSHOT_ON_DEMAND_KEEP'], 0)
+            for path in removed:
+                print(f'removed {path}')
@@ -1,5 +1,8 @@
 /* HerpTracker - Frontend JavaScript */
 
+// URL prefix when the app is served under a collection path (e.g. /c/<name>)
+const ROOT = document.body.dataset.root || '';
+
 // ============ Toast Notifications ============
 function showToast(message, type = 'success') {
     const container = document.getElementById('toast-container');
@@ -49,11 +52,11 @@ async function saveReptile(event) {
     const formData = new FormData(form);
 
     try {
-        let url = '/api/reptile';
+        let url = `${ROOT}/api/reptile`;
         let method = 'POST';
 
         if (mode === 'edit') {
-            url = `/api/reptile/${reptileId}`;
+            url = `${ROOT}/api/reptile/${reptileId}`;
             method = 'PUT';
         }
 
@@ -67,7 +70,7 @@ async function saveReptile(event) {
         if (response.ok && data.success) {
             showToast(mode === 'edit' ? 'Reptile updated!' : 'Reptile added!', 'success');
             setTimeout(() => {
-                window.location.href = `/reptile/${data.reptile.id}`;
+                window.location.href = `${ROOT}/reptile/${data.reptile.id}`;
             }, 500);
         } else {
             showToast(data.error || 'Something went wrong', 'error');
@@ -84,7 +87,7 @@ async function deleteReptile(reptileId) {
     }
 
     try {
-        const response = await fetch(`/api/reptile/${reptileId}`, {
+        const response = await fetch(`${ROOT}/api/reptile/${reptileId}`, {
             method: 'DELETE'
         });
 
@@ -93,7 +96,7 @@ async function deleteReptile(reptileId) {
         if (response.ok && data.success) {
             showToast('Reptile deleted', 'success');
             setTimeout(() => {
-                window.location.href = '/';
+                window.location.href = `${ROOT}/`;
             }, 500);
         } else {
             showToast(data.error || 'Failed to delete', 'error');
@@ -118,7 +121,7 @@ async function addRecord(event, recordType, reptileId) {
     }
 
     try {
-        const response = await fetch(`/api/reptile/${reptileId}/${recordType}`, {
+        const response = await fetch(`${ROOT}/api/reptile/${reptileId}/${recordType}`, {
             method: 'POST',
             body: formData
         });
@@ -127,10 +130,16 @@ async function addRecord(event, recordType, reptileId) {
 
         if (response.ok && data.success) {
             showToast(`${recordType.charAt(0).toUpperCase() + recordType.slice(1)} recorded!`, 'success');
-            // Reload to show updated stats and records
-            setTimeout(() => {
-                window.location.reload();
-            }, 500);
+            // Show the new row right away; stats follow via the live update stream
+            applyChange({
+                action: 'created',
+                record_type: `${recordType}s`,
+                record_id: data[recordType].id,
+                reptile_id: data[recordType].reptile_id,
+                record: data[recordType]
+            });
+            form.reset();
+            fillDefaultDatetimes(form);
         } else {
             showToast(data.error || 'Failed to add record', 'error');
         }
@@ -146,7 +155,7 @@ async function deleteRecord(recordType, recordId) {
     }
 
     try {
-        const response = await fetch(`/api/${recordType}/${recordId}`, {
+        const response = await fetch(`${ROOT}/api/${recordType}/${recordId}`, {
             method: 'DELETE'
         });
 
@@ -154,15 +163,7 @@ async function deleteRecord(recordType, recordId) {
 
         if (response.ok && data.success) {
             showToast('Record deleted', 'success');
-            // Save the current tab before reloading
-            const activeTab = document.querySelector('.tab-btn.active');
-            if (activeTab) {
-                const tabName = activeTab.textContent.toLowerCase().trim();
-                localStorage.setItem('activeRecordTab', tabName);
-            }
-            setTimeout(() => {
-                window.location.reload();
-            }, 500);
+            applyChange({ action: 'deleted', record_type: `${recordType}s`, record_id: recordId });
         } else {
             showToast(data.error || 'Failed to delete', 'error');
         }
@@ -274,7 +275,7 @@ async function saveRecordEdit(event) {
     }
 
     try {
-        const response = await fetch(`/api/${recordType}/${recordId}`, {
+        const response = await fetch(`${ROOT}/api/${recordType}/${recordId}`, {
             method: 'PUT',
             body: formData
         });
@@ -284,9 +285,13 @@ async function saveRecordEdit(event) {
         if (response.ok && data.success) {
             showToast('Record updated!', 'success');
             closeEditModal();
-            setTimeout(() => {
-                window.location.reload();
-            }, 500);
+            applyChange({
+                action: 'updated',
+                record_type: `${recordType}s`,
+                record_id: data[recordType].id,
+                reptile_id: data[recordType].reptile_id,
+                record: data[recordType]
+            });
         } else {
             showToast(data.error || 'Failed to update record', 'error');
         }
@@ -315,10 +320,170 @@ function showTab(tabName) {
     event.target.classList.add('active');
 }
 
+// ============ Live Updates ============
+const STAT_FIELDS = {
+    feeding: 'days_since_feeding',
+    shedding: 'days_since_shedding',
+    defecation: 'days_since_defecation',
+    full_clean: 'days_since_full_clean'
+};
+
+function formatDateTime(iso) {
+    return iso ? iso.slice(0, 16).replace('T', ' ') : '';
+}
+
+function textCell(value) {
+    const cell = document.createElement('td');
+    cell.textContent = value === null || value === undefined || value === '' ? '-' : value;
+    return cell;
+}
+
+function renderRecordRow(recordType, record) {
+    const type = recordType.slice(0, -1);
+    const row = document.createElement('tr');
+    row.dataset.recordId = record.id;
+    row.appendChild(textCell(formatDateTime(record.recorded_at)));
+
+    if (recordType === 'feedings') {
+        row.appendChild(textCell(record.food_type));
+    } else if (recordType === 'sheddings') {
+        row.appendChild(textCell(record.complete ? '✓ Yes' : '✗ Partial'));
+    } else if (recordType === 'measurements') {
+        row.appendChild(textCell(record.length_cm));
+        row.appendChild(textCell(record.weight_g));
+    } else if (recordType === 'cleanings') {
+        const cell = document.createElement('td');
+        const badge = document.createElement('span');
+        const full = record.cleaning_type === 'full';
+        badge.className = full ? 'badge badge-primary' : 'badge badge-secondary';
+        badge.textContent = full ? 'Full Clean' : 'Spot Clean';
+        cell.appendChild(badge);
+        row.appendChild(cell);
+    }
+    row.appendChild(textCell(record.notes));
+
+    const actions = document.createElement('td');
+    actions.className = 'actions-cell';
+    const editBtn = document.createElement('button');
+    editBtn.className = 'btn-icon';
+    editBtn.title = 'Edit';
+    editBtn.textContent = '✏️';
+    editBtn.addEventListener('click', () => openEditModal(type, record.id, record));
+    const deleteBtn = document.createElement('button');
+    deleteBtn.className = 'btn-icon btn-icon-danger';
+    deleteBtn.title = 'Delete';
+    deleteBtn.textContent = '🗑️';
+    deleteBtn.addEventListener('click', () => deleteRecord(type, record.id));
+    actions.append(editBtn, deleteBtn);
+    row.appendChild(actions);
+
+    return row;
+}
+
+function patchRecordTable(change) {
+    const tbody = document.querySelector(`tbody[data-record-type="${change.record_type}"]`);
+    if (!tbody) return;
+
+    const existing = tbody.querySelector(`tr[data-record-id="${change.record_id}"]:not([data-archived])`);
+    if (existing) existing.remove();
+
+    if (change.action !== 'deleted') {
+        // Keep newest first; the date column sorts as text
+        const row = renderRecordRow(change.record_type, change.record);
+        const key = formatDateTime(change.record.recorded_at);
+        const next = Array.from(tbody.querySelectorAll('tr[data-record-id]'))
+            .find(tr => tr.cells[0].textContent < key);
+        tbody.insertBefore(row, next || null);
+    }
+
+    const emptyRow = tbody.querySelector('.empty-row');
+    const hasRows = tbody.querySelector('tr[data-record-id]');
+    if (hasRows && emptyRow) {
+        emptyRow.parentElement.remove();
+    } else if (!hasRows && !emptyRow) {
+        const columns = tbody.closest('table').querySelectorAll('thead th').length;
+        const row = document.createElement('tr');
+        const cell = document.createElement('td');
+        cell.colSpan = columns;
+        cell.className = 'empty-row';
+        cell.textContent = `No ${change.record_type.slice(0, -1)} records yet`;
+        row.appendChild(cell);
+        tbody.appendChild(row);
+    }
+}
+
+function patchStats(reptile) {
+    const overdueDays = Number(document.body.dataset.overdueDays);
+
+    // Dashboard card
+    const card = document.querySelector(`.reptile-card[data-reptile-id="${reptile.id}"]`);
+    if (card) {
+        card.querySelector('[data-field="name"]').textContent = reptile.name;
+        card.querySelector('[data-field="species"]').textContent = reptile.species;
+        ['feeding', 'shedding', 'defecation'].forEach(stat => {
+            const el = card.querySelector(`[data-stat="${stat}"]`);
+            const days = reptile[STAT_FIELDS[stat]];
+            el.querySelector('.stat-value').textContent = days === null ? 'Never' : `${days}d`;
+            if (stat === 'feeding') el.classList.toggle('stat-warning', days !== null && days > overdueDays);
+        });
+    }
+
+    // Profile page
+    const profile = document.querySelector(`.reptile-profile[data-reptile-id="${reptile.id}"]`);
+    if (profile) {
+        profile.querySelector('[data-field="name"]').textContent = reptile.name;
+        Object.keys(STAT_FIELDS).forEach(stat => {
+            const el = profile.querySelector(`[data-stat="${stat}"]`);
+            const days = reptile[STAT_FIELDS[stat]];
+            el.querySelector('.stat-value').textContent = days === null ? 'Never recorded' : `${days} days ago`;
+            if (stat === 'feeding') el.classList.toggle('warning', days !== null && days > overdueDays);
+        });
+
+        const m = reptile.latest_measurement;
+        const parts = m ? [m.length_cm && `${m.length_cm} cm`, m.weight_g && `${m.weight_g} g`].filter(Boolean) : [];
+        profile.querySelector('[data-stat="measurement"] .stat-value').textContent =
+            m ? parts.join(' / ') : 'Never recorded';
+    }
+}
+
+function applyChange(change) {
+    if (change.record_type === 'reptiles') {
+        if (change.action === 'deleted') {
+            const card = document.querySelector(`.reptile-card[data-reptile-id="${change.record_id}"]`);
+            if (card) card.remove();
+            if (document.querySelector(`.reptile-profile[data-reptile-id="${change.record_id}"]`)) {
+                showToast('This reptile was deleted', 'error');
+                setTimeout(() => {
+                    window.location.href = `${ROOT}/`;
+                }, 1500);
+            }
+        }
+    } else if (document.querySelector(`.reptile-profile[data-reptile-id="${change.reptile_id}"]`)) {
+        patchRecordTable(change);
+    }
+
+    if (change.reptile) patchStats(change.reptile);
+}
+
+function initLiveUpdates() {
+    const url = document.body.dataset.eventsUrl;
+    if (!url || !window.EventSource) return;
+    // Only pages that show reptile data need a connection
+    if (!document.querySelector('.reptile-card, .reptile-profile')) return;
+
+    const source = new EventSource(url);
+    source.addEventListener('change', event => applyChange(JSON.parse(event.data)));
+    // Missed too many events while disconnected: start over
+    source.addEventListener('resync', () => {
+        source.close();
+        window.location.reload();
+    });
+}
+
 // ============ Initialize ============
-document.addEventListener('DOMContentLoaded', function () {
+function fillDefaultDatetimes(root) {
     // Set default datetime for record forms to now
-    const datetimeInputs = document.querySelectorAll('input[type="datetime-local"]');
+    const datetimeInputs = root.querySelectorAll('input[type="datetime-local"]');
     const now = new Date();
     now.setMinutes(now.getMinutes() - now.getTimezoneOffset());
     const localISOTime = now.toISOString().slice(0, 16);
@@ -328,17 +493,9 @@ document.addEventListener('DOMContentLoaded', function () {
             input.value = localISOTime;
         }
     });
+}
 
-    // Restore saved tab after delete/edit operation
-    const savedTab = localStorage.getItem('activeRecordTab');
-    if (savedTab) {
-        localStorage.removeItem('activeRecordTab');
-        // Find and click the matching tab button
-        const tabButtons = document.querySelectorAll('.tab-btn');
-        tabButtons.forEach(btn => {
-            if (btn.textContent.toLowerCase().trim() === savedTab) {
-                btn.click();
-            }
-        });
-    }
+document.addEventListener('DOMContentLoaded', function () {
+    fillDefaultDatetimes(document);
+    initLiveUpdates();
 });
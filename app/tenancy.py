@@ -0,0 +1,273 @@
+# Multi-collection support: one SQLite database per tenant
+import io
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+import click
+from flask import abort, current_app, g, has_app_context, request
+from flask_sqlalchemy.session import Session as BaseSession
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+TENANT_SLUG = re.compile(r'^[a-z0-9][a-z0-9-]{0,62}$')
+ENVIRON_KEY = 'herptracker.tenant'
+
+
+class TenantSession(BaseSession):
+    """Session that routes every query to the current request's tenant database."""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and has_app_context():
+            engine = g.get('tenant_engine')
+            if engine is not None:
+                return engine
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+class TenantEngines:
+    """Per-tenant engine cache with LRU eviction of idle engines."""
+
+    def __init__(self, directory, capacity=32, idle_seconds=600, engine_options=None):
+        self.directory = directory
+        self.capacity = capacity
+        self.idle_seconds = idle_seconds
+        self.engine_options = engine_options or {}
+        self._engines = OrderedDict()  # slug -> (engine, last used)
+        self._lock = threading.Lock()
+        self._init_locks = {}  # slug -> lock held while its schema is checked
+        self._initialized = set()  # slugs whose schema is up to date in this process
+
+    def path(self, slug):
+        return os.path.join(self.directory, f'{slug}.db')
+
+    def exists(self, slug):
+        return os.path.isfile(self.path(slug))
+
+    def slugs(self):
+        """All tenants that have a database file."""
+        if not os.path.isdir(self.directory):
+            return []
+        return sorted(name[:-3] for name in os.listdir(self.directory)
+                      if name.endswith('.db') and TENANT_SLUG.match(name[:-3]))
+
+    def get(self, slug):
+        """Return the engine for a tenant, creating and initializing it if needed."""
+        with self._lock:
+            entry = self._engines.pop(slug, None)
+            if entry is not None:
+                self._engines[slug] = (entry[0], time.monotonic())
+                return entry[0]
+            init_lock = self._init_locks.setdefault(slug, threading.Lock())
+
+        # Opening and migrating a database can be slow; only this tenant waits for it
+        engine = create_engine(f'sqlite:///{self.path(slug)}', **self.engine_options)
+        try:
+            with init_lock:
+                if slug not in self._initialized:
+                    _init_schema(engine)
+                    self._initialized.add(slug)
+        except Exception:
+            engine.dispose()
+            raise
+
+        with self._lock:
+            now = time.monotonic()
+            entry = self._engines.pop(slug, None)
+            duplicate, engine = (engine, entry[0]) if entry is not None else (None, engine)
+            self._engines[slug] = (engine, now)
+            evicted = self._evict(now)
+        # Another thread cached an engine first
+        if duplicate is not None:
+            evicted.append(duplicate)
+        for stale in evicted:
+            stale.dispose()
+        return engine
+
+    def _evict(self, now):
+        evicted = []
+        # Over capacity: drop least recently used first
+        while len(self._engines) > self.capacity:
+            _, (engine, _) = self._engines.popitem(last=False)
+            evicted.append(engine)
+        # Idle engines: release their pooled connections and file handles
+        for slug, (engine, last_used) in list(self._engines.items()):
+            if now - last_used > self.idle_seconds:
+                del self._engines[slug]
+                evicted.append(engine)
+        return evicted
+
+    def dispose(self):
+        with self._lock:
+            for engine, _ in self._engines.values():
+                engine.dispose()
+            self._engines.clear()
+
+
+class TenantPathMiddleware:
+    """Strip a ``/<prefix>/<tenant>`` path prefix and expose it via SCRIPT_NAME.
+
+    Moving the prefix into SCRIPT_NAME keeps routing unchanged and makes
+    ``url_for()`` generate tenant-prefixed URLs.
+    """
+
+    def __init__(self, wsgi_app, prefix):
+        self.wsgi_app = wsgi_app
+        self.prefix = '/' + prefix.strip('/')
+
+    def __call__(self, environ, start_response):
+        path = environ.get('PATH_INFO', '')
+        if path.startswith(self.prefix + '/'):
+            slug, _, rest = path[len(self.prefix) + 1:].partition('/')
+            if slug:
+                environ[ENVIRON_KEY] = slug
+                environ['SCRIPT_NAME'] = f"{environ.get('SCRIPT_NAME', '')}{self.prefix}/{slug}"
+                environ['PATH_INFO'] = '/' + rest
+        return self.wsgi_app(environ, start_response)
+
+
+def resolve_tenant():
+    """Work out the tenant slug for the current request, or None for the default collection."""
+    resolver = current_app.config['TENANT_RESOLVER']
+    if resolver == 'header':
+        return request.headers.get(current_app.config['TENANT_HEADER']) or None
+    if resolver == 'path':
+        return request.environ.get(ENVIRON_KEY)
+    if resolver == 'subdomain':
+        host = request.host.split(':')[0].lower()
+        base = current_app.config['TENANT_BASE_DOMAIN']
+        if base and host.endswith('.' + base):
+            return host[:-len(base) - 1]
+        return None
+    raise ValueError(f'Unknown TENANT_RESOLVER: {resolver}')
+
+
+def select_tenant():
+    """Bind the request to its tenant's database (before_request hook)."""
+    slug = resolve_tenant()
+    if slug is None:
+        return
+    if not TENANT_SLUG.match(slug):
+        abort(404)
+
+    engines = current_app.extensions['tenant_engines']
+    if not engines.exists(slug) and not current_app.config['TENANT_AUTO_CREATE']:
+        abort(404)
+
+    g.tenant = slug
+    g.tenant_engine = engines.get(slug)
+
+
+def current_tenant():
+    """Slug of the current request's tenant, or None for the default collection."""
+    return g.get('tenant') if has_app_context() else None
+
+
+def _init_schema(engine):
+    from app.models import init_schema
+    init_schema(engine)
+
+
+# ============ Admin Fan-out ============
+
+def _migrate_tenant(path):
+    engine = create_engine(f'sqlite:///{path}')
+    try:
+        _init_schema(engine)
+    finally:
+        engine.dispose()
+    return path
+
+
+def _export_tenant(path, output):
+    from app.export import write_export
+
+    engine = create_engine(f'sqlite:///{path}')
+    try:
+        buffer = io.BytesIO()
+        with Session(engine) as session:
+            write_export(buffer, session)
+    finally:
+        engine.dispose()
+    with open(output, 'wb') as f:
+        f.write(buffer.getvalue())
+    return output
+
+
+def tenant_paths(app, tenant=None, all_tenants=False):
+    """``(slug, database path)`` for the tenants an admin command should run on."""
+    engines = app.extensions['tenant_engines']
+    if tenant is not None:
+        if not TENANT_SLUG.match(tenant) or not engines.exists(tenant):
+            raise click.BadParameter(f'no such collection: {tenant}', param_hint='--tenant')
+        return [(tenant, engines.path(tenant))]
+    if all_tenants:
+        return [(slug, engines.path(slug)) for slug in engines.slugs()]
+    return []
+
+
+def fan_out(fn, *iterables, workers=None):
+    """Run an admin operation across tenants on a process pool."""
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        yield from executor.map(fn, *iterables)
+
+
+def init_app(app):
+    """Enable per-tenant database routing if TENANCY_ENABLED is set."""
+    engines = TenantEngines(
+        app.config['TENANT_DATABASE_DIR'],
+        capacity=app.config['TENANT_ENGINE_CACHE_SIZE'],
+        idle_seconds=app.config['TENANT_ENGINE_IDLE_SECONDS'],
+        engine_options=app.config.get('SQLALCHEMY_ENGINE_OPTIONS', {})
+    )
+    app.extensions['tenant_engines'] = engines
+
+    if app.config['TENANCY_ENABLED']:
+        os.makedirs(engines.directory, exist_ok=True)
+        app.before_request(select_tenant)
+        if app.config['TENANT_RESOLVER'] == 'path':
+            app.wsgi_app = TenantPathMiddleware(app.wsgi_app, app.config['TENANT_PATH_PREFIX'])
+
+    @app.cli.group('tenants')
+    def tenants_group():
+        """Manage per-collection databases."""
+
+    @tenants_group.command('list')
+    def list_command():
+        """List tenants."""
+        for slug in engines.slugs():
+            print(slug)
+
+    @tenants_group.command('create')
+    @click.argument('slug')
+    def create_command(slug):
+        """Create a new tenant database."""
+        if not TENANT_SLUG.match(slug):
+            raise click.BadParameter('use lowercase letters, digits and dashes', param_hint='SLUG')
+        os.makedirs(engines.directory, exist_ok=True)
+        _migrate_tenant(engines.path(slug))
+        print(f'{slug}: created')
+
+    @tenants_group.command('migrate')
+    @click.option('--workers', type=int, default=None)
+    def migrate_command(workers):
+        """Bring every tenant database up to the current schema."""
+        slugs = engines.slugs()
+        for slug, _ in zip(slugs, fan_out(_migrate_tenant, map(engines.path, slugs), workers=workers)):
+            print(f'{slug}: migrated')
+
+    @tenants_group.command('export')
+    @click.option('--output', type=click.Path(file_okay=False), default='exports')
+    @click.option('--workers', type=int, default=None)
+    def export_command(output, workers):
+        """Export every tenant to its own ZIP file."""
+        os.makedirs(output, exist_ok=True)
+        stamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        slugs = engines.slugs()
+        outputs = [os.path.join(output, f'{slug}_export_{stamp}.zip') for slug in slugs]
+        for written in fan_out(_export_tenant, map(engines.path, slugs), outputs, workers=workers):
+            print(written)
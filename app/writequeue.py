@@ -0,0 +1,128 @@
+# Group-commit write queue for HerpTracker
+import os
+import threading
+import time
+
+
+class _Write:
+    """A single pending insert and its outcome."""
+
+    __slots__ = ('engine', 'table', 'values', 'on_insert', 'done', 'result', 'error')
+
+    def __init__(self, engine, table, values, on_insert=None):
+        self.engine = engine
+        self.table = table
+        self.values = values
+        self.on_insert = on_insert
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class GroupCommitQueue:
+    """Per-process queue that commits inserts in small groups.
+
+    Callers block in submit() until the transaction holding their row has
+    committed, so durability is the same as committing each row on its own;
+    the difference is that one commit (and one fsync) covers the whole group.
+    """
+
+    def __init__(self, max_delay=0.01, max_batch=64, timeout=10):
+        self.max_delay = max_delay
+        self.max_batch = max_batch
+        self.timeout = timeout
+        self._cond = threading.Condition()
+        self._pending = []
+        self._thread = None
+        self._pid = None
+
+    def submit(self, engine, table, values, on_insert=None):
+        """Insert ``values`` into ``table`` and return the new primary key.
+
+        ``on_insert(connection, primary_key)`` runs inside the same transaction.
+        Raises TimeoutError if the writer has not picked the row up within
+        ``timeout`` seconds, in which case it is never written. Once picked up,
+        the row's real outcome is returned or raised.
+        """
+        item = _Write(engine, table, values, on_insert)
+        with self._cond:
+            self._ensure_worker()
+            self._pending.append(item)
+            self._cond.notify()
+        if not item.done.wait(self.timeout):
+            with self._cond:
+                if item in self._pending:
+                    self._pending.remove(item)
+                    raise TimeoutError(f'write to {table.name} not started within {self.timeout}s')
+            # The writer owns it now and may still commit it
+            item.done.wait()
+        if item.error is not None:
+            raise item.error
+        return item.result
+
+    def _ensure_worker(self):
+        # Threads do not survive fork(), so start one per worker process
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._pending = []
+            self._thread = None
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name='group-commit', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._pending:
+                    self._cond.wait()
+                # The delay window opens with the first write of the group
+                deadline = time.monotonic() + self.max_delay
+                while len(self._pending) < self.max_batch:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                batch = self._pending[:self.max_batch]
+                self._pending = self._pending[self.max_batch:]
+
+            groups = {}
+            for item in batch:
+                groups.setdefault(item.engine, []).append(item)
+            for engine, items in groups.items():
+                self._commit(engine, items)
+
+    def _commit(self, engine, items):
+        try:
+            self._insert(engine, items)
+        except Exception:
+            # Don't let one bad row fail the rest of its group
+            for item in items:
+                try:
+                    self._insert(engine, [item])
+                except Exception as e:
+                    item.error = e
+        for item in items:
+            item.done.set()
+
+    @staticmethod
+    def _insert(engine, items):
+        results = []
+        with engine.begin() as conn:
+            for item in items:
+                result = conn.execute(item.table.insert().values(**item.values))
+                primary_key = result.inserted_primary_key[0]
+                if item.on_insert is not None:
+                    item.on_insert(conn, primary_key)
+                results.append(primary_key)
+        for item, result in zip(items, results):
+            item.result = result
+
+
+def init_app(app):
+    """Create the process-wide write queue if WRITE_QUEUE_ENABLED is set."""
+    if app.config['WRITE_QUEUE_ENABLED']:
+        app.extensions['write_queue'] = GroupCommitQueue(
+            max_delay=app.config['WRITE_QUEUE_MAX_DELAY_MS'] / 1000,
+            max_batch=app.config['WRITE_QUEUE_MAX_BATCH'],
+            timeout=app.config['WRITE_QUEUE_TIMEOUT_SECONDS']
+        )
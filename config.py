@@ -15,3 +15,53 @@ class Config:
     UPLOAD_FOLDER = os.path.join(BASEDIR, 'app', 'static', 'uploads')
     MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16MB max upload
     ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'webp'}
+    
+    # Static asset pipeline (see app/assets.py)
+    ASSET_MANIFEST = os.path.join(BASEDIR, 'app', 'static', 'dist', 'manifest.json')
+    ASSET_MAX_AGE = 365 * 24 * 60 * 60  # fingerprinted assets never change
+    ASSET_IMAGE_MAX_SIZE = 192  # px; the navbar logo renders at 3rem
+    
+    # Hot/cold archival (see app/archive.py)
+    ARCHIVE_AFTER_DAYS = int(os.environ.get('ARCHIVE_AFTER_DAYS', 2 * 365))
+    ARCHIVE_RECORD_TYPES = ('cleanings', 'defecations')
+    
+    # Multi-collection support (see app/tenancy.py)
+    TENANCY_ENABLED = os.environ.get('TENANCY_ENABLED', '').lower() in ('1', 'true', 'yes')
+    TENANT_RESOLVER = os.environ.get('TENANT_RESOLVER', 'header')  # 'header', 'subdomain' or 'path'
+    TENANT_HEADER = 'X-HerpTracker-Tenant'
+    TENANT_BASE_DOMAIN = os.environ.get('TENANT_BASE_DOMAIN')  # e.g. 'herptracker.example.com'
+    TENANT_PATH_PREFIX = '/c'  # /c/<tenant>/...
+    TENANT_DATABASE_DIR = os.path.join(BASEDIR, 'instance', 'tenants')
+    TENANT_AUTO_CREATE = False
+    TENANT_ENGINE_CACHE_SIZE = 32
+    TENANT_ENGINE_IDLE_SECONDS = 10 * 60
+    
+    # Group-commit write queue for new records (see app/writequeue.py)
+    WRITE_QUEUE_ENABLED = os.environ.get('WRITE_QUEUE_ENABLED', '').lower() in ('1', 'true', 'yes')
+    WRITE_QUEUE_MAX_DELAY_MS = int(os.environ.get('WRITE_QUEUE_MAX_DELAY_MS', 10))
+    WRITE_QUEUE_MAX_BATCH = 64
+    WRITE_QUEUE_TIMEOUT_SECONDS = 10  # a write the writer has not started by then fails instead of hanging
+    
+    # Morph genetics: JSON trait catalog replacing the built-in one (see app/genetics.py)
+    GENETICS_CATALOG_PATH = os.environ.get('GENETICS_CATALOG_PATH')
+    GENETICS_CACHE_SIZE = 8192  # entries per memo cache (parsed mutations, pairings, partial pairings)
+    
+    # Dashboard
+    DASHBOARD_PAGE_SIZE = 24
+    FEEDING_OVERDUE_DAYS = 7
+    
+    # Live updates over Server-Sent Events (see app/events.py)
+    SSE_POLL_INTERVAL = 0.5  # seconds between change log polls, per worker process
+    SSE_HEARTBEAT_SECONDS = 15
+    SSE_MAX_STREAM_SECONDS = 5 * 60  # clients reconnect transparently with Last-Event-ID
+    SSE_MAX_STREAMS = int(os.environ.get('SSE_MAX_STREAMS', 16))  # per process; keep below the thread count
+    CHANGE_LOG_RETENTION_SECONDS = 60 * 60
+    
+    # Point-in-time snapshots for exports, analytics and hot backups (see app/snapshots.py)
+    SNAPSHOTS_ENABLED = os.environ.get('SNAPSHOTS_ENABLED', '1').lower() in ('1', 'true', 'yes')
+    SNAPSHOT_DIR = os.environ.get('SNAPSHOT_DIR', os.path.join(BASEDIR, 'instance', 'snapshots'))
+    SNAPSHOT_INTERVAL_MINUTES = int(os.environ.get('SNAPSHOT_INTERVAL_MINUTES', 60))  # 0: on demand only
+    SNAPSHOT_MAX_STALENESS_SECONDS = 60  # exports snapshot first if the newest is older
+    SNAPSHOT_KEEP = int(os.environ.get('SNAPSHOT_KEEP', 24))  # newest snapshots kept per database
+    SNAPSHOT_KEEP_DAILY = int(os.environ.get('SNAPSHOT_KEEP_DAILY', 7))  # plus one per day for this many days
+    SNAPSHOT_ON_DEMAND_KEEP = 2  # snapshots taken for exports, rotated separately from the scheduled ones